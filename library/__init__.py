@@ -1,4 +1,5 @@
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from PySide6.QtWidgets import QApplication
@@ -13,13 +14,17 @@ from library import database, interface
 def run():  # pragma: no cover
     home_path = Path(__file__).parent.parent.absolute()
     db_path = home_path / "USER_DATA_DO_NOT_DELETE.db"
-    db = database.Database(db_path)
+    # Opening the database can take a while if papers need to be updated, so read in
+    # the fonts in the background while that happens
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        font_data = executor.submit(interface.read_fonts)
+        db = database.Database(db_path)
 
-    # The application is what starts QT
-    app = QApplication()
+        # The application is what starts QT
+        app = QApplication()
 
-    # then set up the fonts
-    interface.set_up_fonts()
+        # then set up the fonts. Qt needs this to be done in this main thread
+        interface.set_up_fonts(font_data.result())
 
     # set up app icon
     app.setWindowIcon(QIcon(str(home_path / "library" / "resources" / "icon.png")))
@@ -1,8 +1,21 @@
 import re
+import threading
 from pathlib import Path
+from urllib.parse import unquote
 
 import ads
 
+# Set up a few regular expressions to identify both arXiv IDs and things with the year
+# at the front, which is used when checking for bibcodes directly. These are compiled
+# once here rather than every time they're used.
+# https://arxiv.org/help/arxiv_identifier
+_ARXIV_ID = re.compile(r"[0-9]{4}\.[0-9]{4,5}")
+_ARXIV_ID_OLD = re.compile(r"[a-z.-]*/[0-9]{7}$")
+# http://adsabs.github.io/help/actions/bibcode
+_YEAR_AT_FRONT = re.compile(r"^[0-9]{4}")
+# the bibcode in an ADS URL is always the thing after "abs", before any query string
+_ADS_URL_BIBCODE = re.compile(r"/abs/([^/?#]+)")
+
 
 class ADSWrapper(object):
     """
@@ -25,6 +38,10 @@ class ADSWrapper(object):
 
         # read in the file of bibcodes
         self.bibstems = dict()
+        # Papers may be looked up from several threads at once (e.g. when importing a
+        # bibtex file), so only one of them can build the bibstems, and the others
+        # wait until they're complete
+        self._bibstems_lock = threading.Lock()
 
         # have a object to keep track of rate limits
         self.rate = ads.RateLimits("SearchQuery")
@@ -277,6 +294,31 @@ class ADSWrapper(object):
             arxiv_id = arxiv_id[:4] + "." + arxiv_id[4:]
             return self._get_bibcode_from_arxiv(arxiv_id)
 
+    @staticmethod
+    def bibcode_from_ads_url(url):
+        """
+        Get the bibcode from an ADS URL, without querying ADS
+
+        This bibcode may be out of date, if it is for a paper that was on the arXiv
+        when the URL was made, but has since been published.
+
+        :param url: The ADS URL that links to the paper
+        :type url: str
+        :return: The bibcode in this URL
+        :rtype: str
+        """
+        # first get the bibcode from the URL. This is always the thing after "abs"
+        # in the abstract
+        match = _ADS_URL_BIBCODE.search(url)
+        if match is None:
+            raise ValueError(f"Identifier {url} not recognized")
+        # the URL may be percent-encoded, most often with %26 for the and sign
+        bibcode = unquote(match.group(1))
+        # make sure it's the appropriate length for a bibcode
+        if len(bibcode) != 19:
+            raise ValueError(f"Identifier {url} not recognized")
+        return bibcode
+
     def get_bibcode(self, identifier):
         """
         Get the bibcode of a paper based on one of many ways to access a paper.
@@ -293,14 +335,6 @@ class ADSWrapper(object):
         :return: The ADS bibcode of the paper referenced.
         :rtype: str
         """
-        # Set up a few regular expressions to identify both arXiv IDs and things with
-        # the year at the front, which is used when checking for bibcodes directly
-        # https://arxiv.org/help/arxiv_identifier
-        arxiv_id_re = re.compile(r"[0-9]{4}\.[0-9]{4,5}")
-        arxiv_id_old_re = re.compile(r"[a-z.-]*/[0-9]{7}$")
-        # http://adsabs.github.io/help/actions/bibcode
-        year_at_front = re.compile(r"^[0-9]{4}")
-
         # When we get the bibcode, we may need to update it. If we get the bibcode by
         # querying ADS (either for the arXiv ID or DOI), it will return the updated
         # bibcode. However, if we do so by parsing the identifier, we'll call the
@@ -308,17 +342,7 @@ class ADSWrapper(object):
 
         # check if it looks like an ADS URL. This is the easiest and most reliable case
         if "adsabs.harvard.edu/abs/" in identifier:
-            # first get the bibcode from the URL. This is always the thing after "abs"
-            # in the abstract
-            split_url = identifier.split("/")
-            bibcode_idx = split_url.index("abs") + 1
-            bibcode = split_url[bibcode_idx]
-            # sometimes there's the placeholder for the and sign in the URL
-            bibcode = bibcode.replace("%26", "&")
-            # make sure it's the appropriate length for a bibcode
-            if len(bibcode) != 19:
-                raise ValueError(f"Identifier {identifier} not recognized")
-            return self._update_bibcode(bibcode)
+            return self._update_bibcode(self.bibcode_from_ads_url(identifier))
         # see if it looks like a DOI.
         # We check DOI next since it's a simple check, and sometimes DOIs can have
         # segments that look like an arXiv ID, fooling my simple regex
@@ -331,25 +355,18 @@ class ADSWrapper(object):
         # next check if it looks like a plain bibcode
         # # http://adsabs.github.io/help/actions/bibcode
         # re.match only looks at the beginning of the string, where the year will be
-        elif len(identifier) == 19 and re.match(year_at_front, identifier):
+        elif len(identifier) == 19 and _YEAR_AT_FRONT.match(identifier):
             return self._update_bibcode(identifier)  # they passed in the bibcode
-        # see if it has a new-style arXiv ID
-        # re.search looks anywhere in the string, so we check this only after we have
+        # see if it has an arXiv ID, either new or old style.
+        # search looks anywhere in the string, so we check this only after we have
         # tried other methods that may be more clear
-        elif re.search(arxiv_id_re, identifier) is not None:
-            # get the part of the string that is the arXiv ID
-            arxiv_id = re.search(arxiv_id_re, identifier).group()
-            # then run the query
-            return self._get_bibcode_from_arxiv(arxiv_id)
-        # see if it looks like an old style arXiv id
-        elif re.search(arxiv_id_old_re, identifier) is not None:
-            # get the part of the string that is the arXiv ID
-            arxiv_id = re.search(arxiv_id_old_re, identifier).group()
-            # then run the query
-            return self._get_bibcode_from_arxiv(arxiv_id)
+        for arxiv_id_re in [_ARXIV_ID, _ARXIV_ID_OLD]:
+            arxiv_match = arxiv_id_re.search(identifier)
+            if arxiv_match is not None:
+                # get the part of the string that is the arXiv ID, then run the query
+                return self._get_bibcode_from_arxiv(arxiv_match.group())
         # otherwise we don't know what to do
-        else:
-            raise ValueError(f"Identifier {identifier} not recognized")
+        raise ValueError(f"Identifier {identifier} not recognized")
 
     def get_bibcode_from_journal(self, **kwargs):
         """
@@ -359,8 +376,9 @@ class ADSWrapper(object):
         :return:
         """
         # see if we need to build the bibstems
-        if len(self.bibstems) == 0:
-            self._build_bibstems()
+        with self._bibstems_lock:
+            if len(self.bibstems) == 0:
+                self._build_bibstems()
 
         # sometimes both page and pages can be used. I'll use page as my default. Same
         # with authors and author
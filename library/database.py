@@ -1,9 +1,11 @@
 import sqlite3
-import sys
+import re
+import json
 import time
 import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
 from pathlib import Path
-from collections import defaultdict
 
 import bibtexparser
 import requests.exceptions
@@ -13,6 +15,47 @@ from library import ads_wrapper
 # set up the ADS wrapper object that will be used by the Library
 ads_call = ads_wrapper.ADSWrapper()
 
+# abbreviations for journals that are shown in the cite string
+_JOURNAL_ABBREV = {
+    "The Astrophysical Journal": "ApJ",
+    "The Astrophysical Journal Supplement Series": "ApJS",
+    "Monthly Notices of the Royal Astronomical Society": "MNRAS",
+    "Astronomy and Astrophysics": "A&A",
+    "Astronomy and Astrophysics Supplement Series": "A&AS",
+    "The Astronomical Journal": "AJ",
+    "Annual Review of Astronomy and Astrophysics": "ARA&A",
+    "Publications of the Astronomical Society of the Pacific": "PASP",
+    "Publications of the Astronomical Society of Japan": "PASJ",
+}
+
+# the columns of the papers table needed to build the cite string
+_CITE_STRING_COLUMNS = "authors, pubdate, page, arxiv_id, journal, volume"
+
+# each bibtex entry starts with an @ at the beginning of a line
+_BIBTEX_ENTRY_START = re.compile(r"^(?=@)", re.MULTILINE)
+# comments and empty lines are skipped when importing bibtex entries
+_BIBTEX_SKIPPED_LINE = re.compile(r"^(?:%[^\n]*|[^\S\n]*)(?:\n|\Z)", re.MULTILINE)
+
+# accents are removed from bibtex values when importing, along with a space after
+_BIBTEX_ACCENT = re.compile(r"\\(?:[`'^\"~=.]|[uvHtcdbk]) ?")
+# then nonbreaking spaces are replaced, and quotes and braces removed
+_BIBTEX_VALUE_TABLE = str.maketrans({"~": " ", '"': None, "{": None, "}": None})
+
+# header of the file holding the bibtex entries that couldn't be imported
+_FAILURE_FILE_HEADER = (
+    "% This file contains BibTeX entries that the library could not add.\n"
+    "% The reason for the failure is given above each entry.\n"
+    '% When importing a given entry, the code looks for the "doi", "ads_url",\n'
+    '% or "eprint" attributes. If none of these are present, the code tries\n'
+    '% to use the publication details (using the "author", "journal", "year"\n'
+    '% "volume", "page", "title" fields, as available) to identify the\n'
+    "% paper's entry in ADS. When using this journal info, the code requires\n"
+    "% an exact match to any attributes present in the BibTeX entry. \n\n"
+)
+
+# characters to remove or replace with underscores in the machine cite string
+_MCS_TABLE = str.maketrans({",": None, ".": None, "&": None, " ": "_", ":": "_"})
+
 
 class PaperAlreadyInDatabaseError(Exception):
     """
@@ -27,8 +70,9 @@ class Database(object):
     Class that handles the database access
     """
 
-    # When we store the authors, we can't store a list object. So we need to parse it a
-    # bit to make it a string. We'll join the list of authors with this separator
+    # When we store the authors, we can't store a list object, so it's stored as a
+    # JSON array. Older versions of the library instead joined the list of authors
+    # with this separator, which we need to know to convert old databases.
     _author_sep = "&&&&"
 
     # store the columns that will be in the database.
@@ -57,6 +101,21 @@ class Database(object):
         :type db_file: str
         """
         self.db_file = db_file
+        # When several commands need to be done together, they share one connection
+        # inside a transaction (see _transaction). This holds that connection, and is
+        # separate for each thread, since sqlite connections can't be shared.
+        self._local = threading.local()
+        # The tag names are needed every time a paper is tagged or checked for a tag.
+        # They only change when tags are added, deleted, or renamed, so we keep them in
+        # memory and reset this when that happens.
+        self._tags_cache = None
+        # Cite strings are shown for every paper in the interface, and take several
+        # queries to build. They rarely change, so we store them by bibcode. Entries
+        # are removed whenever an attribute of that paper is set or it is deleted.
+        self._cite_cache = dict()
+        # Imports run in a background thread, so the caches can be used by more than
+        # one thread at once. This lock is held when using them.
+        self._cache_lock = threading.Lock()
 
         # Create the papers table, adding the paper attributes
         self._execute(
@@ -78,22 +137,65 @@ class Database(object):
             "update_time real"
             ")"
         )
+        # Tags are kept in their own tables. The tags table holds the names of all
+        # tags, and paper_tags has one row for each tag applied to each paper. Tags are
+        # case-insensitive, so that "Unread" and "unread" can't both exist.
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS tags(tag text PRIMARY KEY COLLATE NOCASE)"
+        )
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS paper_tags"
+            "("
+            "bibcode text,"
+            "tag text COLLATE NOCASE,"
+            "PRIMARY KEY(bibcode, tag)"
+            ")"
+        )
+        # the primary key handles looking up the tags of one paper, this index handles
+        # finding the papers with one tag
+        self._execute("CREATE INDEX IF NOT EXISTS paper_tags_by_tag ON paper_tags(tag)")
+        # older versions stored tags as columns of the papers table, so convert those
+        self._convert_tag_columns()
+
+        # convert authors stored by older versions, which are joined by the separator
+        # rather than stored as a JSON array. This only does anything the first time
+        # an old database is opened. All papers are converted in one transaction, so
+        # that this is quick and can't be left half done.
+        with self._transaction():
+            old_authors = self._execute_raw(
+                "SELECT bibcode, authors FROM papers WHERE authors NOT LIKE '[%'"
+            )
+            self._execute_many(
+                "UPDATE papers SET authors = ? WHERE bibcode = ?",
+                [
+                    (json.dumps(authors.split(self._author_sep)), bibcode)
+                    for bibcode, authors in old_authors
+                ],
+            )
 
         # then update all papers, as necessary
+        # don't simply check that the journal is set. Soemtimes there can be
+        # intermediate updates to a paper, where the journal can be set but not
+        # the full information. Once the page info is set, the paper will be
+        # fully updated.
+        # we also check that the paper has not been checked in the last 24 hours.
+        # this is prevent unnecessary calls to ADS, and to let the interface
+        # open faster when not checking for updates.
+        # Most papers are published, so this index only holds the few that aren't,
+        # letting us find the papers to check without reading the whole table. This
+        # is made here, after any changes to the table above that would remove it.
+        self._execute(
+            "CREATE INDEX IF NOT EXISTS unpublished_papers "
+            "ON papers(update_time) WHERE page = -1"
+        )
         yesterday = time.time() - 24 * 60 * 60
-        for bibcode in self.get_all_bibcodes():
-            # don't simply check that the journal is set. Soemtimes there can be
-            # intermediate updates to a paper, where the journal can be set but not
-            # the full information. Once the page info is set, the paper will be
-            # fully updated.
-            # we also check that the paper has not been checked in the last 24 hours.
-            # this is prevent unnecessary calls to ADS, and to let the interface
-            # open faster when not checking for updates.
-            if (
-                self.get_paper_attribute(bibcode, "page") == -1
-                and self.get_paper_attribute(bibcode, "update_time") <= yesterday
-            ):
-                self.update_paper(bibcode)
+        to_update = self._execute(
+            "SELECT bibcode FROM papers WHERE page = -1 AND update_time <= ?",
+            (yesterday,),
+        )
+        # sort here rather than in the query, which would stop it using the index
+        for bibcode in sorted([row["bibcode"] for row in to_update]):
+            self.update_paper(bibcode)
 
     def _execute(self, sql, parameters=()):
         """
@@ -108,16 +210,138 @@ class Database(object):
         :return: List of rows returned by the query, if applicable.
         :rtype: list
         """
-        # use with statements to auto-close
+        # using this factory makes the returned quantities easier to use
+        return self._execute_with_factory(sql, parameters, sqlite3.Row)
+
+    def _execute_raw(self, sql, parameters=()):
+        """
+        Execute a given command to the database, returning rows as plain tuples.
+
+        This is like _execute, but skips making a Row object for each row, which adds
+        up for queries returning many rows. Values must be accessed by index.
+
+        :param sql: The SQL command, with question marks in any values, to be replaced
+                    by the values in the parameters tuple.
+        :type sql: str
+        :param parameters: Tuple containing values to replace the ? in the sql. Should
+                           be the same length as the number of ?.
+        :type parameters: tuple
+        :return: List of tuples returned by the query, if applicable.
+        :rtype: list
+        """
+        return self._execute_with_factory(sql, parameters, None)
+
+    def _execute_with_factory(self, sql, parameters, row_factory):
+        """
+        Execute a given command to the database, with a given type for the rows.
+
+        :param sql: The SQL command, with question marks in any values, to be replaced
+                    by the values in the parameters tuple.
+        :type sql: str
+        :param parameters: Tuple containing values to replace the ? in the sql. Should
+                           be the same length as the number of ?.
+        :type parameters: tuple
+        :param row_factory: The row factory to use for the cursor, or None for tuples
+        :type row_factory: type
+        :return: List of rows returned by the query, if applicable.
+        :rtype: list
+        """
+        # if we're inside a transaction, use its connection. It will commit at the end
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            with contextlib.closing(conn.cursor()) as cursor:
+                cursor.row_factory = row_factory
+                cursor.execute(sql, parameters)
+                return cursor.fetchall()
+        # otherwise use with statements to auto-close
         with contextlib.closing(sqlite3.connect(self.db_file)) as conn:
-            # using this factory makes the returned quantities easier to use
-            conn.row_factory = sqlite3.Row
             with conn:  # auto commits changes to the database
                 with contextlib.closing(conn.cursor()) as cursor:
+                    cursor.row_factory = row_factory
                     cursor.execute(sql, parameters)
                     return cursor.fetchall()
 
-    def add_paper(self, identifier):
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        Context manager to run several commands to the database in one transaction.
+
+        All calls to _execute inside this share one connection, and the changes are
+        committed together at the end, or all rolled back if there is an error.
+        Transactions can be nested, in which case the inner one joins the outer one.
+
+        :return: None
+        """
+        if getattr(self._local, "conn", None) is not None:
+            yield
+            return
+        with contextlib.closing(sqlite3.connect(self.db_file)) as conn:
+            with conn:  # auto commits changes to the database
+                # start the transaction here, rather than letting sqlite3 start it at
+                # the first change, so that table changes are part of it too
+                conn.execute("BEGIN")
+                self._local.conn = conn
+                try:
+                    yield
+                except BaseException:
+                    # the caches may hold changes that are being rolled back
+                    self._clear_caches()
+                    raise
+                finally:
+                    self._local.conn = None
+
+    def _clear_caches(self):
+        """
+        Remove everything from the caches of tags and cite strings.
+
+        :return: None
+        """
+        with self._cache_lock:
+            self._tags_cache = None
+            self._cite_cache.clear()
+
+    def _execute_many(self, sql, parameters_list):
+        """
+        Execute a given command to the database once for each set of parameters.
+
+        This is much quicker than calling _execute many times with the same command.
+
+        :param sql: The SQL command, with question marks in any values, to be replaced
+                    by the values in each of the parameters tuples.
+        :type sql: str
+        :param parameters_list: List of tuples containing values to replace the ? in
+                                the sql. Each should be the same length as the number
+                                of ?.
+        :type parameters_list: list
+        :return: None
+        """
+        with self._transaction():
+            with contextlib.closing(self._local.conn.cursor()) as cursor:
+                cursor.executemany(sql, parameters_list)
+
+    def _execute_iter(self, sql, parameters=()):
+        """
+        Execute a given command to the database, yielding rows as they are read.
+
+        This is like _execute_raw, but doesn't hold all the rows in memory at once.
+        This should only be used for queries that read from the database, and the
+        connection stays open until the loop over the rows is done.
+
+        :param sql: The SQL command, with question marks in any values, to be replaced
+                    by the values in the parameters tuple.
+        :type sql: str
+        :param parameters: Tuple containing values to replace the ? in the sql. Should
+                           be the same length as the number of ?.
+        :type parameters: tuple
+        :return: Generator of the rows returned by the query, as tuples
+        :rtype: generator
+        """
+        with contextlib.closing(sqlite3.connect(self.db_file)) as conn:
+            with contextlib.closing(conn.cursor()) as cursor:
+                cursor.execute(sql, parameters)
+                yield from cursor
+
+    def add_paper(self, identifier, tag_unread=True):
         """
         Add a paper to the database.
 
@@ -136,6 +360,8 @@ class Database(object):
         :param identifier: This can be one of many things that can be used to identify
                            a paper, listed above.
         :type identifier: str
+        :param tag_unread: Whether to give the paper the unread tag, if that tag exists
+        :type tag_unread: bool
         :return: bibcode, so the user knows what was added
         :rtype: str
         :raises: PaperAlreadyInDatabaseError if paper is already in the library
@@ -144,49 +370,66 @@ class Database(object):
         bibcode = ads_call.get_bibcode(identifier)
         # before we get all the info, see if the paper is already in the database. This
         # saves us from needing slow queries to ADS
-        result = self._execute("SELECT 1 FROM papers WHERE bibcode = ?", [bibcode])
         # if this paper is already in the database, exit
-        if len(result) > 0:
+        if self.paper_exists(bibcode):
             raise PaperAlreadyInDatabaseError("Already in Library.")
         # otherwise, get the data and add the paper
         paper_data = ads_call.get_info(bibcode)
 
-        # handle the authors - this should be passed in as a list, but we can't store it
-        # as a list. Just join it all together with the unique value held above.
-        authors_write = self._author_sep.join(paper_data["authors"])
-        # the formatting of this is kinda ugly
+        # get the values to store in each column
+        row = self._new_paper_row(bibcode, paper_data)
         # put these into the comma separated column names
-        joined_colnames = ",".join(self.colnames_set_on_paper_add)
+        joined_colnames = ",".join(row.keys())
         # also make the appropriate amount of question marks based on the number of
         # column names. This is needed for safe parameter entry
-        question_marks = ",".join(["?"] * len(self.colnames_set_on_paper_add))
+        question_marks = ",".join(["?"] * len(row))
         # combine this together into the SQL query
         sql = f"INSERT INTO papers({joined_colnames}) VALUES({question_marks})"
-        # then put the values as a tuple before passing it in, for formatting nicely
-        parameters = (
-            bibcode,
-            paper_data["title"],
-            authors_write,
-            paper_data["pubdate"],
-            paper_data["journal"],
-            paper_data["volume"],
-            paper_data["page"],
-            paper_data["abstract"],
-            paper_data["bibtex"],
-            paper_data["arxiv_id"],
-            bibcode,  # citation keyword
-            time.time(),  # update time
-        )
-        # then run this SQL
-        self._execute(sql, parameters)
-
-        # Add the unread tag if it's in the database
-        for t in self.get_all_tags():
-            if t.lower() == "unread":
-                self.tag_paper(bibcode, t)
+        parameters = tuple(row.values())
+        # then run this SQL, and add the unread tag if it's in the database. The tags
+        # table is case-insensitive, so this finds any capitalization of unread.
+        with self._transaction():
+            self._execute(sql, parameters)
+            if tag_unread:
+                self._execute(
+                    "INSERT INTO paper_tags(bibcode, tag) "
+                    "SELECT ?, tag FROM tags WHERE tag = 'unread'",
+                    (bibcode,),
+                )
 
         return bibcode
 
+    @staticmethod
+    def _new_paper_row(bibcode, paper_data):
+        """
+        Get the values of the columns set when a paper is added to the database
+
+        :param bibcode: The bibcode of the paper
+        :type bibcode: str
+        :param paper_data: The paper details from ADS
+        :type paper_data: dict
+        :return: Dictionary with the column names as keys, holding the values to
+                 store in each column. These are in the order of
+                 colnames_set_on_paper_add.
+        :rtype: dict
+        """
+        return {
+            "bibcode": bibcode,
+            "title": paper_data["title"],
+            # handle the authors - this should be passed in as a list, but we can't
+            # store it as a list. Store it as a JSON array instead.
+            "authors": json.dumps(paper_data["authors"]),
+            "pubdate": paper_data["pubdate"],
+            "journal": paper_data["journal"],
+            "volume": paper_data["volume"],
+            "page": paper_data["page"],
+            "abstract": paper_data["abstract"],
+            "bibtex": paper_data["bibtex"],
+            "arxiv_id": paper_data["arxiv_id"],
+            "citation_keyword": bibcode,
+            "update_time": time.time(),
+        }
+
     def get_paper_attribute(self, bibcode, attribute):
         """
         Get a given attribute about a given paper.
@@ -199,15 +442,36 @@ class Database(object):
         :return: The value of the attribute of the requested paper.
         :rtype: list, str, or int
         """
-        # check that the attribute is in the columns
-        if (attribute not in self.colnames_data) and (
-            attribute not in self._get_all_tags_internal()
-        ):
-            raise ValueError("This attribute is not in the table")
+        return self.get_paper_attributes(bibcode, [attribute])[attribute]
+
+    def get_paper_attributes(self, bibcode, attributes):
+        """
+        Get several attributes about a given paper at once.
 
-        # get the rows from the table where the bibtex matches.
+        This gets them all in one query, rather than one query for each attribute.
+
+        :param bibcode: Bibcode of the desired paper.
+        :type bibcode: str
+        :param attributes: Desired attributes of the paper. These need to be ones that
+                           are in the table.
+        :type attributes: list
+        :return: Dictionary with the attributes as keys and the values of those
+                 attributes of the requested paper as values
+        :rtype: dict
+        """
+        # check that the attributes are in the columns
+        for attribute in attributes:
+            if attribute not in self.colnames_data:
+                raise ValueError("This attribute is not in the table")
+
+        # get the rows from the table where the bibtex matches. The bibtex entry needs
+        # the citation keyword too, so get it in the same query
+        columns = list(attributes)
+        if "bibtex" in columns and "citation_keyword" not in columns:
+            columns.append("citation_keyword")
+        columns_sql = ", ".join(f"`{c}`" for c in columns)
         rows = self._execute(
-            f"SELECT `{attribute}` FROM papers WHERE bibcode=?", (bibcode,)
+            f"SELECT {columns_sql} FROM papers WHERE bibcode=?", (bibcode,)
         )
         # if we didn't find anything, tell the user
         if len(rows) == 0:
@@ -216,12 +480,54 @@ class Database(object):
         # We've already checked that there are no duplicates, so this should just be
         # one item, but we'll check
         assert len(rows) == 1
-        # then get the value from this row
-        r_value = rows[0][attribute]
+        return {a: self._attribute_from_row(rows[0], a) for a in attributes}
+
+    def get_all_paper_attributes(self, attributes):
+        """
+        Get several attributes of every paper in the library at once.
+
+        This gets them all in one query, rather than one query for each paper.
+
+        :param attributes: Desired attributes of the papers. These need to be ones that
+                           are in the table.
+        :type attributes: list
+        :return: Dictionary with bibcodes as keys. The values are dictionaries with the
+                 attributes as keys and the values of those attributes as values.
+        :rtype: dict
+        """
+        # check that the attributes are in the columns
+        for attribute in attributes:
+            if attribute not in self.colnames_data:
+                raise ValueError("This attribute is not in the table")
+
+        columns = ["bibcode"] + list(attributes)
+        if "bibtex" in columns and "citation_keyword" not in columns:
+            columns.append("citation_keyword")
+        columns_sql = ", ".join(f"`{c}`" for c in columns)
+        rows = self._execute(f"SELECT {columns_sql} FROM papers")
+        return {
+            row["bibcode"]: {a: self._attribute_from_row(row, a) for a in attributes}
+            for row in rows
+        }
+
+    def _attribute_from_row(self, row, attribute):
+        """
+        Get the value of an attribute from a row of the papers table.
+
+        Some attributes aren't stored the same way they're used, so this converts them.
+
+        :param row: The row of the papers table for a paper.
+        :type row: sqlite3.Row
+        :param attribute: The attribute to get.
+        :type attribute: str
+        :return: The value of the attribute of this paper.
+        :rtype: list, str, or int
+        """
+        r_value = row[attribute]
         # we do have to do a check for a couple attributes, since they're special.
         # Authors list needs to be put back as a list
         if attribute == "authors":
-            return r_value.split(self._author_sep)
+            return json.loads(r_value)
         # page needs to be put back to an integer, if it is able
         elif attribute == "page":
             try:
@@ -231,17 +537,32 @@ class Database(object):
         # user the user's citaiton key when exporting the bibtex entry
         # we store it as the raw bibtex, then replace the value when processing
         elif attribute == "bibtex":
-            # here we just need to replace the key at the beginning
-            new_key = self.get_paper_attribute(bibcode, "citation_keyword")
-            bibtex_rows = r_value.split("\n")
-            # find the open brace that starts to specify the key
-            brace_idx = bibtex_rows[0].find("{")
-            bibtex_rows[0] = bibtex_rows[0][: brace_idx + 1] + new_key + ","
-            return "\n".join(bibtex_rows)
+            return self._bibtex_with_key(r_value, row["citation_keyword"])
 
         else:  # no modification needed
             return r_value
 
+    @staticmethod
+    def _bibtex_with_key(bibtex, citation_keyword):
+        """
+        Replace the key of a bibtex entry with the user's citation keyword
+
+        :param bibtex: The bibtex entry, as stored in the database
+        :type bibtex: str
+        :param citation_keyword: The key to put in the bibtex entry
+        :type citation_keyword: str
+        :return: The bibtex entry with the new key
+        :rtype: str
+        """
+        # here we just need to replace the key at the end of the first line. I find
+        # where that line ends rather than splitting the whole entry into lines
+        first_row_end = bibtex.find("\n")
+        if first_row_end == -1:
+            first_row_end = len(bibtex)
+        # find the open brace that starts to specify the key
+        brace_idx = bibtex.find("{", 0, first_row_end)
+        return bibtex[: brace_idx + 1] + citation_keyword + "," + bibtex[first_row_end:]
+
     def set_paper_attribute(self, bibcode, attribute, new_value):
         """
         Set a given attribute about a given paper.
@@ -256,18 +577,19 @@ class Database(object):
         :return: None
         """
         # check that the attribute is in the columns
-        if (attribute not in self.colnames_data) and (
-            attribute not in self._get_all_tags_internal()
-        ):
+        if attribute not in self.colnames_data:
             raise ValueError("This attribute is not in the table")
         # and that the bibcode is in the library
-        if not bibcode in self.get_all_bibcodes():
+        if not self.paper_exists(bibcode):
             raise ValueError("This paper is not in the table")
+        # the cite string may depend on this attribute, so remove it from the cache
+        with self._cache_lock:
+            self._cite_cache.pop(bibcode, None)
 
         # we do have to do a check for the author list, since it's special. We'll need
-        # to put it back as a list.
+        # to store it as a JSON array.
         if attribute == "authors":
-            new_value = self._author_sep.join(new_value)
+            new_value = json.dumps(new_value)
         # we have to validate that spaces aren't in any citation keywords
         elif attribute == "citation_keyword":
             if " " in new_value:
@@ -287,6 +609,18 @@ class Database(object):
                 f"{attribute} needs to be unique. " f"{new_value} is already used. "
             )
 
+    def paper_exists(self, bibcode):
+        """
+        See if a paper is in the database.
+
+        :param bibcode: Bibcode of the paper to look for.
+        :type bibcode: str
+        :return: Whether or not this paper is in the database.
+        :rtype: bool
+        """
+        rows = self._execute("SELECT 1 FROM papers WHERE bibcode = ?", (bibcode,))
+        return len(rows) > 0
+
     def num_papers(self):
         """
         Get the number of papers in the database.
@@ -294,7 +628,7 @@ class Database(object):
         :return: The number of papers in the database.
         :rtype: int
         """
-        return len(self.get_all_bibcodes())
+        return self._execute_raw("SELECT COUNT(*) FROM papers")[0][0]
 
     def get_all_bibcodes(self):
         """
@@ -303,8 +637,8 @@ class Database(object):
         :return: List of bibcodes for all papers in the library.
         :rtype: list
         """
-        papers = self._execute("SELECT bibcode FROM papers")
-        return [p["bibcode"] for p in papers]
+        papers = self._execute_raw("SELECT bibcode FROM papers")
+        return [p[0] for p in papers]
 
     def get_cite_string(self, bibcode):
         """
@@ -320,10 +654,50 @@ class Database(object):
         :return: Cite string for this paper
         :rtype: str
         """
-        authors = self.get_paper_attribute(bibcode, "authors")
+        with self._cache_lock:
+            try:
+                return self._cite_cache[bibcode]
+            except KeyError:
+                cite_string = self._get_cite_string_uncached(bibcode)
+                self._cite_cache[bibcode] = cite_string
+                return cite_string
+
+    def _get_cite_string_uncached(self, bibcode):
+        """
+        Build the short citation string for a given paper from the database.
+
+        See get_cite_string for the format. This does not use the cache.
+
+        :param bibcode: Bibcode to get the citation string for.
+        :type bibcode: str
+        :return: Cite string for this paper
+        :rtype: str
+        """
+        # get everything needed in one query, rather than one per attribute
+        rows = self._execute(
+            f"SELECT {_CITE_STRING_COLUMNS} FROM papers WHERE bibcode=?",
+            (bibcode,),
+        )
+        if len(rows) == 0:
+            raise ValueError(f"Bibcode {bibcode} not found in library!")
+        return self._cite_string_from_row(rows[0])
+
+    @staticmethod
+    def _cite_string_from_row(row):
+        """
+        Build the short citation string for a paper from its row in the database.
+
+        See get_cite_string for the format.
+
+        :param row: The row of the papers table for this paper. This must contain the
+                    columns in _CITE_STRING_COLUMNS.
+        :type row: dict
+        :return: Cite string for this paper
+        :rtype: str
+        """
         # get the author last names. The format of the names is firstname, lastname
         # so splitting by comma works
-        authors_last_names = [a.split(",")[0] for a in authors]
+        authors_last_names = [a.split(",")[0] for a in json.loads(row["authors"])]
         # if we have lot of authors, just show the first with et al.
         if len(authors_last_names) > 3:
             authors_str = f"{authors_last_names[0]} et al."
@@ -331,12 +705,19 @@ class Database(object):
             authors_str = ", ".join(authors_last_names)
 
         # the publication date has the year first, separated by dashes
-        year = self.get_paper_attribute(bibcode, "pubdate").split("-")[0]
+        year = row["pubdate"].split("-")[0]
+
+        # page is stored as text, so needs to be put back to an integer if it can be
+        page = row["page"]
+        try:
+            page = int(page)
+        except ValueError:  # strings cannot be converted
+            pass
 
         # treat unpublished papers differently than published ones
-        if self.get_paper_attribute(bibcode, "page") == -1:  # this is unpublished
+        if page == -1:  # this is unpublished
             # Include the arXiv ID if it's there, otherwise don't include that at all
-            arxiv_id = self.get_paper_attribute(bibcode, "arxiv_id")
+            arxiv_id = row["arxiv_id"]
             if arxiv_id == "Not on the arXiv":
                 return f"{authors_str}, {year}"
             else:
@@ -345,29 +726,35 @@ class Database(object):
         # implicit else clause here since we return inside the if loop. This handles
         # published papers
         # the journal may have an abbreviation
-        journal = self.get_paper_attribute(bibcode, "journal")
-        abbreviations = {
-            "The Astrophysical Journal": "ApJ",
-            "The Astrophysical Journal Supplement Series": "ApJS",
-            "Monthly Notices of the Royal Astronomical Society": "MNRAS",
-            "Astronomy and Astrophysics": "A&A",
-            "Astronomy and Astrophysics Supplement Series": "A&AS",
-            "The Astronomical Journal": "AJ",
-            "Annual Review of Astronomy and Astrophysics": "ARA&A",
-            "Publications of the Astronomical Society of the Pacific": "PASP",
-            "Publications of the Astronomical Society of Japan": "PASJ",
-        }
-        if journal in abbreviations:
-            journal = abbreviations[journal]
+        journal = _JOURNAL_ABBREV.get(row["journal"], row["journal"])
 
         # Then join everything together
-        return (
-            f"{authors_str}, "
-            f"{year}, "
-            f"{journal}, "
-            f"{self.get_paper_attribute(bibcode, 'volume')}, "
-            f"{self.get_paper_attribute(bibcode, 'page')}"
-        )
+        return f"{authors_str}, {year}, {journal}, {row['volume']}, {page}"
+
+    def get_all_titles_and_cite_strings(self):
+        """
+        Get the title and short citation string of all papers in the library.
+
+        This gets everything in one query, so is much faster than getting these for
+        each paper separately. The cite strings are stored in the cache too.
+
+        :return: Dictionary with bibcodes as keys and (title, cite string) as values
+        :rtype: dict
+        """
+        results = dict()
+        with self._cache_lock:
+            rows = self._execute(
+                f"SELECT bibcode, title, {_CITE_STRING_COLUMNS} FROM papers"
+            )
+            for row in rows:
+                bibcode = row["bibcode"]
+                try:
+                    cite_string = self._cite_cache[bibcode]
+                except KeyError:
+                    cite_string = self._cite_string_from_row(row)
+                    self._cite_cache[bibcode] = cite_string
+                results[bibcode] = (row["title"], cite_string)
+        return results
 
     def get_machine_cite_string(self, bibcode):
         """
@@ -383,35 +770,20 @@ class Database(object):
         :return: cite string for this paper
         :rtype: str
         """
-        cite_string = self.get_cite_string(bibcode)
-        for c in [",", ".", "&"]:
-            cite_string = cite_string.replace(c, "")
-        for c in [" ", ":"]:
-            cite_string = cite_string.replace(c, "_")
-        cite_string = cite_string.replace("et_al", "etal")
-        return cite_string.lower()
-
-    @staticmethod
-    def _to_internal_tag_name(tag_name):
-        """
-        Parses a user-supplied tag name into the internal name that will be used in
-        the database
-
-        Here we replace spaces with a unique separator, and put "tag" at the beginning
-
-        :param tag_name: User supplied tag name
-        :type tag_name: str
-        :return: The useful internal tag name for this tag
-        :rtype: str
-        """
-        return f"tag_{tag_name.replace(' ', 'abcdefghijklmnopqrstuvwxyz')}"
+        # remove punctuation and replace spaces in one pass over the string
+        cite_string = self.get_cite_string(bibcode).translate(_MCS_TABLE)
+        return cite_string.replace("et_al", "etal").lower()
 
     @staticmethod
     def _undo_internal_tag_name(internal_tag_name):
         """
-        Parses the intertal tag name into a regular name that the user sees
+        Parses the internal tag name used by older versions into the tag name
+
+        Older versions of the library stored each tag as a column in the papers table,
+        with "tag_" at the beginning and spaces replaced by the alphabet. This is only
+        needed to convert those databases.
 
-        :param internal_tag_name: Tag in the database
+        :param internal_tag_name: Tag column in the database
         :type internal_tag_name: str
         :return: The human-friendly tag name
         :rtype: str
@@ -422,6 +794,107 @@ class Database(object):
             "abcdefghijklmnopqrstuvwxyz", " "
         )
 
+    def _convert_tag_columns(self):
+        """
+        Move tags stored as columns of the papers table into the tags tables
+
+        Older versions of the library stored each tag as a column in the papers table.
+        This copies them into the tags and paper_tags tables, then removes the columns.
+        This only does anything the first time an old database is opened.
+
+        :return: None
+        """
+        columns = self._execute("PRAGMA table_info(papers)")
+        tag_columns = [c["name"] for c in columns if c["name"].startswith("tag_")]
+        if len(tag_columns) == 0:
+            return
+
+        # This is all done in one transaction, so that if it is interrupted the
+        # database is left as it was, rather than with the papers table half rebuilt.
+        with self._transaction():
+            for internal_tag in tag_columns:
+                tag_name = self._undo_internal_tag_name(internal_tag)
+                self._execute("INSERT OR IGNORE INTO tags(tag) VALUES(?)", (tag_name,))
+                self._execute(
+                    f"INSERT OR IGNORE INTO paper_tags(bibcode, tag) "
+                    f"SELECT bibcode, ? FROM papers WHERE `{internal_tag}` = 1",
+                    (tag_name,),
+                )
+
+            # The easy way to remove the columns is to drop them in place, but this
+            # requires sqlite >= 3.35. This came out in 2021, so some people likely do
+            # not have it, especially if they're using an older version of python. I
+            # won't want users to have to install their own version of sqlite just for
+            # this, so if the drop fails I'll fall back to the long way to deleting a
+            # column.
+            try:
+                for internal_tag in tag_columns:
+                    self._execute(f"ALTER TABLE papers DROP COLUMN `{internal_tag}`")
+            except sqlite3.OperationalError:
+                self._rebuild_papers_table()
+
+    def _rebuild_papers_table(self):
+        """
+        Rebuild the papers table with only the paper attribute columns
+
+        This is only needed for versions of sqlite older than 3.35, which do not
+        support DROP COLUMN. All the steps are done in one transaction, so that the
+        papers table can't be left deleted before the new one takes its place.
+
+        :return: None
+        """
+        with self._transaction():
+            # Documentation found here:
+            # sqlite.org/lang_altertable.html#making_other_kinds_of_table_schema_changes
+            # first create a new table
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS new_papers"
+                "("
+                "bibcode text PRIMARY KEY,"
+                "title text,"
+                "authors text,"
+                "pubdate text,"
+                "journal text,"
+                "volume integer,"
+                "page text,"
+                "abstract text,"
+                "bibtex text,"
+                "arxiv_id text,"
+                "local_file text,"
+                "user_notes text,"
+                "citation_keyword text UNIQUE,"
+                "update_time real"
+                ")"
+            )
+            # then transfer all the data
+            # basic format is INSERT INTO new_papers SELECT col1, col2 FROM papers;
+            # These must be in the same order as when we made the table (so we can't use
+            # self.colnames_data, which has a different order)
+            all_keys = [
+                "bibcode",
+                "title",
+                "authors",
+                "pubdate",
+                "journal",
+                "volume",
+                "page",
+                "abstract",
+                "bibtex",
+                "arxiv_id",
+                "local_file",
+                "user_notes",
+                "citation_keyword",
+                "update_time",
+            ]
+            self._execute(
+                f"INSERT INTO new_papers "
+                f'SELECT {",".join([f"`{k}`" for k in all_keys])} '
+                f"FROM papers"
+            )
+            # delete the original, then rename the temp to be the regular table
+            self._execute("DROP TABLE papers")
+            self._execute("ALTER TABLE new_papers RENAME TO papers")
+
     def add_new_tag(self, tag_name):
         """
         Add a new tag option to the database, but does not add it to any papers.
@@ -433,26 +906,22 @@ class Database(object):
         # check that the tag is not just whitespace
         if tag_name.strip() == "":
             raise ValueError("Tag cannot be empty")
-        # I use backticks to enclose the tag name in the SQL query (to allow other
-        # punctuation to be included), so they cannot be part of the tag name. My other
-        # options were single quotes, double quotes, or square brackets, but I figured
-        # backticks were less likely to be included than those other choices
-        # See this for more: https://www.sqlite.org/lang_keywords.html
-        # I did later find that for old versions of sqlite (I specifically tested
-        # 3.30.0, but I don't know what other versions this applies to), square
-        # brackets didn't work in tag names, even when surrounded by backticks
+        # Older versions of the library stored tags as column names enclosed in
+        # backticks, so they could not be part of the tag name. I also found that for
+        # old versions of sqlite (I specifically tested 3.30.0, but I don't know what
+        # other versions this applies to), square brackets didn't work in tag names,
+        # even when surrounded by backticks. Tags are now stored as values, but we keep
+        # these restrictions so tags behave the same as before.
         elif "`" in tag_name or "[" in tag_name or "]" in tag_name:
             raise ValueError("Tag cannot include backticks or square brackets")
-        # convert the tag name
-        internal_tag = self._to_internal_tag_name(tag_name)
+        # the tag table ignores case, so this catches duplicates in any capitalization
         try:
-            self._execute(
-                f"ALTER TABLE papers "
-                f"ADD COLUMN `{internal_tag}` INTEGER NOT NULL "
-                f"DEFAULT 0;"
-            )
-        except sqlite3.OperationalError:  # will happen if the tag is already in there
+            self._execute("INSERT INTO tags(tag) VALUES(?)", (tag_name,))
+        except sqlite3.IntegrityError:  # will happen if the tag is already in there
             raise ValueError("Tag already in database!")
+        finally:
+            with self._cache_lock:
+                self._tags_cache = None
 
     def delete_tag(self, tag_name):
         """
@@ -466,78 +935,10 @@ class Database(object):
         if tag_name not in self.get_all_tags():
             raise ValueError("Tag does not exist!")
 
-        # The easy way to do this is to do:
-        # ALTER TABLE papers DROP COLUMN internal_tag
-        # but this requires sqlite > 3.35. This came out in 2021, so some people
-        # likely do not have it, especially if they're using an older version of
-        # python. I won't want users to have to install their own version of sqlite
-        # just for this. So instead, I'll do the long way to deleting a column.
-        # Documentation found here:
-        # sqlite.org/lang_altertable.html#making_other_kinds_of_table_schema_changes
-        # first create a new tabls
-        self._execute(
-            "CREATE TABLE IF NOT EXISTS new_papers"
-            "("
-            "bibcode text PRIMARY KEY,"
-            "title text,"
-            "authors text,"
-            "pubdate text,"
-            "journal text,"
-            "volume integer,"
-            "page text,"
-            "abstract text,"
-            "bibtex text,"
-            "arxiv_id text,"
-            "local_file text,"
-            "user_notes text,"
-            "citation_keyword text UNIQUE,"
-            "update_time real"
-            ")"
-        )
-
-        # first add columns for all the tags. I'll also keep track of all the columns
-        # that will be in the new table, so I can keep track of them. When we use these
-        # later, they must be in the same order as when we added them in the previous
-        # command (so we can't use the self.colnames_data, which has a different order)
-        all_keys = [
-            "bibcode",
-            "title",
-            "authors",
-            "pubdate",
-            "journal",
-            "volume",
-            "page",
-            "abstract",
-            "bibtex",
-            "arxiv_id",
-            "local_file",
-            "user_notes",
-            "citation_keyword",
-            "update_time",
-        ]
-        for internal_tag in self._get_all_tags_internal():
-            # don't add the tag we're trying to delete
-            if self._undo_internal_tag_name(internal_tag) != tag_name:
-                # add it to the table, and store it in the list of names we'll
-                # transfer data
-                self._execute(
-                    f"ALTER TABLE new_papers "
-                    f"ADD COLUMN `{internal_tag}` INTEGER NOT NULL "
-                    f"DEFAULT 0;"
-                )
-                all_keys.append(internal_tag)
-        # then transfer all the data
-        # basic format is INSERT INTO new_papers SELECT col1, col2 FROM papers;
-        # need to use backticks to enclose each key, to make sure nothing weird happens
-        # with certain characters
-        self._execute(
-            f"INSERT INTO new_papers "
-            f'SELECT {",".join([f"`{k}`" for k in all_keys])} '
-            f"FROM papers"
-        )
-        # delete the original, then rename the temp to be the regular table
-        self._execute("DROP TABLE papers")
-        self._execute("ALTER TABLE new_papers RENAME TO papers")
+        self._execute("DELETE FROM paper_tags WHERE tag = ?", (tag_name,))
+        self._execute("DELETE FROM tags WHERE tag = ?", (tag_name,))
+        with self._cache_lock:
+            self._tags_cache = None
 
     def rename_tag(self, old_tag_name, new_tag_name):
         """
@@ -550,22 +951,40 @@ class Database(object):
         :type new_tag_name: str
         :return: None
         """
-        # first check if the new tag name is just the old tag name but different in
-        # capitalization. This causes issues, as sqlite is case-insensitive. So we'll
-        # need to first rename it to something unique, then rename that
+        # first check that the tag we're renaming actually exists
+        if old_tag_name not in self.get_all_tags():
+            raise ValueError("Tag does not exist!")
+        # If the new tag name is just the old tag name but different in capitalization,
+        # it's the same row in the case-insensitive tags table, so we can just update
+        # it. Otherwise add the new tag, which checks that the new name is valid.
         if old_tag_name.lower() == new_tag_name.lower():
-            temp_colname = "abczyx" * 10
-            self.rename_tag(old_tag_name, temp_colname)
-            old_tag_name = temp_colname
-
-        # add the new tag
-        self.add_new_tag(new_tag_name)
-        # transfer tags
-        for bibcode in self.get_all_bibcodes():
-            if self.paper_has_tag(bibcode, old_tag_name):
-                self.tag_paper(bibcode, new_tag_name)
-        # then delete the old paper
-        self.delete_tag(old_tag_name)
+            self._execute(
+                "UPDATE tags SET tag = ? WHERE tag = ?", (new_tag_name, old_tag_name)
+            )
+        else:
+            self.add_new_tag(new_tag_name)
+            self._execute("DELETE FROM tags WHERE tag = ?", (old_tag_name,))
+        # then move the tagged papers over to the new name
+        self._execute(
+            "UPDATE paper_tags SET tag = ? WHERE tag = ?", (new_tag_name, old_tag_name)
+        )
+        with self._cache_lock:
+            self._tags_cache = None
+
+    def _check_tag_and_bibcode(self, bibcode, tag_name):
+        """
+        Check that a tag and paper are both in the database before tagging a paper
+
+        :param bibcode: The bibcode of the paper
+        :type bibcode: str
+        :param tag_name: The name of the tag
+        :type tag_name: str
+        :return: None, but raises a ValueError if either is not in the database
+        """
+        if tag_name not in self.get_all_tags():
+            raise ValueError("This tag is not in the database")
+        if not self.paper_exists(bibcode):
+            raise ValueError("This paper is not in the table")
 
     def paper_has_tag(self, bibcode, tag_name):
         """
@@ -578,8 +997,13 @@ class Database(object):
         :return: Whether or not this tag is applied to this paper/
         :rtype: bool
         """
-        internal_tag = self._to_internal_tag_name(tag_name)
-        return self.get_paper_attribute(bibcode, internal_tag) == 1
+        if tag_name not in self.get_all_tags():
+            raise ValueError("This tag is not in the database")
+        rows = self._execute(
+            "SELECT 1 FROM paper_tags WHERE bibcode = ? AND tag = ?",
+            (bibcode, tag_name),
+        )
+        return len(rows) > 0
 
     def tag_paper(self, bibcode, tag_name):
         """
@@ -591,7 +1015,11 @@ class Database(object):
         :type tag_name: str
         :return: None
         """
-        self.set_paper_attribute(bibcode, self._to_internal_tag_name(tag_name), 1)
+        self._check_tag_and_bibcode(bibcode, tag_name)
+        self._execute(
+            "INSERT OR IGNORE INTO paper_tags(bibcode, tag) VALUES(?, ?)",
+            (bibcode, tag_name),
+        )
 
     def untag_paper(self, bibcode, tag_name):
         """
@@ -603,38 +1031,46 @@ class Database(object):
         :type tag_name: str
         :return: None
         """
-        self.set_paper_attribute(bibcode, self._to_internal_tag_name(tag_name), 0)
+        self._check_tag_and_bibcode(bibcode, tag_name)
+        self._execute(
+            "DELETE FROM paper_tags WHERE bibcode = ? AND tag = ?", (bibcode, tag_name)
+        )
 
-    def _get_all_tags_internal(self):
+    def get_all_tags(self):
         """
-        Get the names of all tags in the database, in the internal format.
+        Get the names of all tags in the database. This is sorted, ignoring case
 
-        :return: List of all tags stored in the database
+        :return: List of tags that are stored in the database
         :rtype: list
         """
-        # first we do a dummy query where we can just get the column names. We can't
-        # use _execute for this because it doesn't return what we need. But this
-        # duplicates part of that
-        # use with statements to auto-close
-        with contextlib.closing(sqlite3.connect(self.db_file)) as conn:
-            with conn:  # auto commits changes to the database
-                with contextlib.closing(conn.cursor()) as cursor:
-                    cursor.execute("select * from papers where 1=0;")
-                    return sorted(
-                        [d[0] for d in cursor.description if d[0].startswith("tag_")]
-                    )
+        with self._cache_lock:
+            if self._tags_cache is None:
+                tags = self._execute("SELECT tag FROM tags")
+                self._tags_cache = sorted(
+                    [t["tag"] for t in tags], key=lambda t: t.lower()
+                )
+            # return a copy, so callers can't modify the cache
+            return self._tags_cache.copy()
 
-    def get_all_tags(self):
+    def _get_tags_with_prefix(self, prefix):
         """
-        Get the names of all tags in the database. This is sorted, ignoring case
+        Get the names of all tags that start with a given prefix
 
-        :return: List of tags that are stored in the database
+        :param prefix: The beginning of the tag names to find. This is case-sensitive
+        :type prefix: str
+        :return: List of tags that start with this prefix, sorted ignoring case
         :rtype: list
         """
-        return sorted(
-            [self._undo_internal_tag_name(t) for t in self._get_all_tags_internal()],
-            key=lambda t: t.lower(),
+        # Let the database find the matches, using the index on the tags. LIKE uses %
+        # and _ as wildcards, so those must be escaped, as they may be in the prefix
+        # (especially underscores in file names).
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = self._execute(
+            "SELECT tag FROM tags WHERE tag LIKE ? ESCAPE '\\'", (escaped + "%",)
         )
+        # LIKE ignores case, but the prefix should not
+        tags = [r["tag"] for r in rows if r["tag"].startswith(prefix)]
+        return sorted(tags, key=lambda t: t.lower())
 
     def get_paper_tags(self, bibcode):
         """
@@ -645,8 +1081,25 @@ class Database(object):
         :return: List of tags that this paper has
         :rtype: list
         """
-        # We don't need to sort, since get_all_tags() is already sorted.
-        return [t for t in self.get_all_tags() if self.paper_has_tag(bibcode, t)]
+        tags = self._execute("SELECT tag FROM paper_tags WHERE bibcode = ?", (bibcode,))
+        return sorted([t["tag"] for t in tags], key=lambda t: t.lower())
+
+    def get_papers_with_tag(self, tag_name):
+        """
+        Get the bibcodes of all papers that have a given tag.
+
+        :param tag_name: The name of the tag to get the papers of
+        :type tag_name: str
+        :return: Set of bibcodes of the papers that have this tag
+        :rtype: set
+        """
+        if tag_name not in self.get_all_tags():
+            raise ValueError("This tag is not in the database")
+        # This uses the index on the tags, so it doesn't need to look at every paper
+        rows = self._execute(
+            "SELECT bibcode FROM paper_tags WHERE tag = ?", (tag_name,)
+        )
+        return {r["bibcode"] for r in rows}
 
     def delete_paper(self, bibcode):
         """
@@ -658,6 +1111,9 @@ class Database(object):
         # create the SQL code with question marks as the placeholder
         sql = f"DELETE FROM papers WHERE bibcode = ?"
         self._execute(sql, (bibcode,))
+        self._execute("DELETE FROM paper_tags WHERE bibcode = ?", (bibcode,))
+        with self._cache_lock:
+            self._cite_cache.pop(bibcode, None)
 
     def update_paper(self, old_bibcode):
         """
@@ -684,29 +1140,55 @@ class Database(object):
             # no update found, we can exit
             return
 
-        # the easiest thing is to actually delete the original paper, then add a new
-        # one with the new bibcode, keeping the data that's user-generated. Don't yet
-        # update the citation keyword, since that must be unique. We instead do that
-        # after deleting the paper, but have to get it first
-        self.add_paper(new_bibcode)
-        for field in ["user_notes", "local_file"]:
-            old_attribute = self.get_paper_attribute(old_bibcode, field)
-            self.set_paper_attribute(new_bibcode, field, old_attribute)
-        old_citation_keyword = self.get_paper_attribute(old_bibcode, "citation_keyword")
-        # also transfer the tags
-        for tag in self.get_paper_tags(old_bibcode):
-            self.tag_paper(new_bibcode, tag)
-
-        # then delete the paper
-        self.delete_paper(old_bibcode)
-        # and set the citation keyword. If it's just the default bibcode, I'll update
-        # to the new bibcode. If the user had set a custom keyword, keep that.
-        if old_citation_keyword == old_bibcode:
-            self.set_paper_attribute(new_bibcode, "citation_keyword", new_bibcode)
-        else:
-            self.set_paper_attribute(
-                new_bibcode, "citation_keyword", old_citation_keyword
+        # Get the new details from ADS first, so we aren't waiting on the network in
+        # the middle of the transaction below
+        paper_data = ads_call.get_info(new_bibcode)
+        old_row = self._execute(
+            "SELECT user_notes, local_file, citation_keyword FROM papers "
+            "WHERE bibcode = ?",
+            (old_bibcode,),
+        )[0]
+        # we replace the original paper with a new one with the new bibcode, keeping
+        # the data that's user-generated
+        row = self._new_paper_row(new_bibcode, paper_data)
+        row["user_notes"] = old_row["user_notes"]
+        row["local_file"] = old_row["local_file"]
+        # If the citation keyword is just the default bibcode, I'll update to the new
+        # bibcode. If the user had set a custom keyword, keep that.
+        if old_row["citation_keyword"] != old_bibcode:
+            row["citation_keyword"] = old_row["citation_keyword"]
+
+        joined_colnames = ",".join(row.keys())
+        question_marks = ",".join(["?"] * len(row))
+        with self._transaction():
+            # The new bibcode may already be in the library, if the user added the
+            # published paper separately. In that case we keep that paper as it is,
+            # so the user's notes, file, and citation keyword for it aren't lost.
+            new_paper_exists = self.paper_exists(new_bibcode)
+            # delete the original first, since the citation keyword must be unique
+            self._execute("DELETE FROM papers WHERE bibcode = ?", (old_bibcode,))
+            # Upserts would do this, but need sqlite >= 3.24, so we check ourselves
+            if not new_paper_exists:
+                self._execute(
+                    f"INSERT INTO papers({joined_colnames}) VALUES({question_marks})",
+                    tuple(row.values()),
+                )
+            # transfer the tags
+            self._execute(
+                "UPDATE OR IGNORE paper_tags SET bibcode = ? WHERE bibcode = ?",
+                (new_bibcode, old_bibcode),
             )
+            self._execute("DELETE FROM paper_tags WHERE bibcode = ?", (old_bibcode,))
+            # Like any newly added paper, it's also marked unread
+            if not new_paper_exists:
+                self._execute(
+                    "INSERT OR IGNORE INTO paper_tags(bibcode, tag) "
+                    "SELECT ?, tag FROM tags WHERE tag = 'unread'",
+                    (new_bibcode,),
+                )
+        with self._cache_lock:
+            self._cite_cache.pop(old_bibcode, None)
+            self._cite_cache.pop(new_bibcode, None)
 
     def export(self, tag_name, file_name):
         """
@@ -723,12 +1205,24 @@ class Database(object):
         # check that the tag exists
         if tag_name not in self.get_all_tags() + ["all"]:
             raise ValueError("This tag does not exist")
-        # otherwise, write to the file
+        # get the entries in one query. Bibcodes start with the year, so sorting by
+        # them puts the papers in order of date
+        if tag_name == "all":
+            rows = self._execute_iter(
+                "SELECT bibtex, citation_keyword FROM papers ORDER BY bibcode"
+            )
+        else:
+            rows = self._execute_iter(
+                "SELECT bibtex, citation_keyword FROM papers "
+                "WHERE bibcode IN (SELECT bibcode FROM paper_tags WHERE tag = ?) "
+                "ORDER BY bibcode",
+                (tag_name,),
+            )
+        # then write them to the file as we read them
         with open(file_name, "w") as out_file:
-            for bibcode in self.get_all_bibcodes():
-                if tag_name == "all" or self.paper_has_tag(bibcode, tag_name):
-                    out_file.write(self.get_paper_attribute(bibcode, "bibtex"))
-                    out_file.write("\n")
+            for bibtex, citation_keyword in rows:
+                out_file.write(self._bibtex_with_key(bibtex, citation_keyword))
+                out_file.write("\n")
 
     def import_bibtex(self, file_name, update_progress_bar=None):
         """
@@ -739,8 +1233,8 @@ class Database(object):
         :param update_progress_bar: A function that can be called to update a progress
                                     bar. This must be previously initialized to be the
                                     number of lines in the file. In this function, we
-                                    will call the function passed in here with the line
-                                    number of the current line to update the progressbar
+                                    will call the function passed in here with the
+                                    number of lines read so far after each entry
         :type update_progress_bar: func
         :return: A tuple indicating the results of what happened. First is the number
                  of papers added successfully, then the number of papers that were
@@ -750,80 +1244,114 @@ class Database(object):
                  file where I write the failed bibtex entries for the user to inspect.
                  Finally, there is the name of the tag applied to the added papers.
         """
-        bibfile = open(file_name, "r")
-        # We'll create a file holding the bibtex entries that I could not identify.
-        # We'll delete this later if it has nothing in it
-        failure_file_loc = self._failure_file_loc(file_name)
-        failure_file = open(failure_file_loc, "w")
-        # write the header to this file
-        header = (
-            "% This file contains BibTeX entries that the library could not add.\n"
-            "% The reason for the failure is given above each entry.\n"
-            '% When importing a given entry, the code looks for the "doi", "ads_url",\n'
-            '% or "eprint" attributes. If none of these are present, the code tries\n'
-            '% to use the publication details (using the "author", "journal", "year"\n'
-            '% "volume", "page", "title" fields, as available) to identify the\n'
-            "% paper's entry in ADS. When using this journal info, the code requires\n"
-            "% an exact match to any attributes present in the BibTeX entry. \n\n"
-        )
-        failure_file.write(header)
-
-        # figure out what tag to give this paper. It will be of the format
-        # "Import [import_filename] X", where X is an optional integer that will be
-        # present if this file is imported more than once, and will
-        base_tag = f"Import {file_name.name}"
-        import_tags = [t for t in self.get_all_tags() if t.startswith(base_tag)]
-        if len(import_tags) == 0:
-            new_tag = base_tag
-        # check the case that there's just one tag
-        elif import_tags == [base_tag]:
-            new_tag = base_tag + " 2"
-        # there are multiple of these tags already present, so we need to increment
-        else:
-            tag_nums = [int(t.split()[-1]) for t in import_tags if t != base_tag]
-            new_tag = base_tag + f" {max(tag_nums) + 1}"
-        self.add_new_tag(new_tag)
-
-        results = {"success": 0, "duplicate": 0, "failure": 0}
-        current_entry = ""
-        line_number = 0
-        for line in bibfile:
-            # update progressbar first. We do this so it is updated before we continue
-            # over empty lines or comments
-            if update_progress_bar is not None:
-                line_number += 1
-                update_progress_bar(line_number)
-
-            # skip comments and empty lines
-            if line.startswith("%") or line.strip() == "":
-                continue
-            # once we get to the beginning of a new entry, add the current entry to
-            # the database. Otherwise, keep track of the current entry
-            if line.startswith("@") and current_entry.strip() != "":
-                this_result = self._parse_bibtex_entry(
-                    current_entry, new_tag, failure_file
+        # read the whole file at once, then split it into the entries. BibTeX files
+        # from journals and ADS are UTF-8, so don't depend on the system's locale
+        with open(file_name, "r", encoding="utf-8") as bibfile:
+            text = bibfile.read()
+        # We'll keep track of the bibtex entries that I could not identify, which are
+        # written to a file at the end if there are any
+        failures = []
+
+        # First split the file into entries. Splitting before each @ gives each entry
+        # as one chunk, plus anything before the first entry. We also keep the number
+        # of lines in each, for the progress bar. Every chunk but the last ends with a
+        # newline, and the last line of the file still counts if it doesn't have one
+        entries = []
+        for chunk in _BIBTEX_ENTRY_START.split(text):
+            if chunk != "":
+                # skip comments and empty lines
+                entry = _BIBTEX_SKIPPED_LINE.sub("", chunk)
+                n_lines = chunk.count("\n") + (not chunk.endswith("\n"))
+                entries.append((entry, n_lines))
+
+        # Finding each paper on ADS is the slow part, and doesn't depend on the other
+        # entries, so we look them all up in parallel. I don't use too many threads, to
+        # be nice to ADS. This is all done before changing the database, so that it
+        # isn't locked while we wait on ADS.
+        bibcode_cache = dict()
+        lines_read = 0
+        # The lookups can skip ADS for papers already in the library. They can't ask
+        # the database themselves, since sqlite connections can't be shared between
+        # threads. So we get the papers here, and whether each paper is a duplicate is
+        # checked as it's added below.
+        existing_bibcodes = frozenset(self.get_all_bibcodes())
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            # chunks with only comments or empty lines are left empty after the
+            # skipped lines are removed, so there is nothing to look up
+            lookups = [
+                (
+                    self._start_bibtex_lookup(
+                        executor, entry, bibcode_cache, existing_bibcodes
+                    )
+                    if entry != ""
+                    else None
                 )
-                results[this_result] += 1
-
-                # once we have parsed the previous entry, start the new one
-                current_entry = line
+                for entry, _ in entries
+            ]
+            # wait for the lookups in order, updating the progressbar as each is done.
+            # Any errors are kept in the lookup, and handled when adding the papers.
+            for (entry, n_lines), lookup in zip(entries, lookups):
+                if lookup is not None:
+                    lookup.exception()
+                if update_progress_bar is not None:
+                    lines_read += n_lines
+                    update_progress_bar(lines_read)
+
+        # Do all the changes to the database in one transaction, so they're committed
+        # once at the end, rather than after every paper
+        results = {"success": 0, "duplicate": 0, "failure": 0}
+        with self._transaction():
+            # figure out what tag to give this paper. It will be of the format
+            # "Import [import_filename] X", where X is an optional integer that will be
+            # present if this file is imported more than once, and will
+            base_tag = f"Import {file_name.name}"
+            # Only tags that are exactly the base tag plus a number count, so that other
+            # tags the user made that happen to start with the base tag are ignored
+            tag_num_pattern = re.compile(re.escape(base_tag) + r" (\d+)")
+            tag_nums = []
+            for tag in self._get_tags_with_prefix(base_tag):
+                if tag == base_tag:
+                    tag_nums.append(1)
+                else:
+                    match = tag_num_pattern.fullmatch(tag)
+                    if match is not None:
+                        tag_nums.append(int(match.group(1)))
+            if len(tag_nums) == 0:
+                new_tag = base_tag
             else:
-                current_entry += line
-
-        # handle the final entry
-        if current_entry.strip() != "":
-            results[self._parse_bibtex_entry(current_entry, new_tag, failure_file)] += 1
-
-        bibfile.close()
-        failure_file.close()
-        # if there were no failures, remove the failure file. I got the exact size of
-        # just the header, which is what we compare to here. It's different on
-        # different platforms, annoyingly. On windows, it's different because
-        # newlines have different size.
-        empty_size = defaultdict(lambda: 544)  # default value for linux and macos
-        empty_size["win32"] = empty_size["darwin"] + header.count("\n")
-        if failure_file_loc.stat().st_size == empty_size[sys.platform]:
-            failure_file_loc.unlink()
+                new_tag = base_tag + f" {max(tag_nums) + 1}"
+            self.add_new_tag(new_tag)
+
+            # Then go through the results in order to add the papers to the database.
+            # We keep track of which papers were added or were already in the library,
+            # so we can tag them all at once at the end
+            imported_bibcodes = []
+            for (entry, _), lookup in zip(entries, lookups):
+                if lookup is not None:
+                    result, bibcode = self._parse_bibtex_entry(entry, failures, lookup)
+                    results[result] += 1
+                    if bibcode is not None:
+                        imported_bibcodes.append(bibcode)
+
+            # Add the special tag to all papers in the file
+            self._execute_many(
+                "INSERT OR IGNORE INTO paper_tags(bibcode, tag) VALUES(?, ?)",
+                [(bibcode, new_tag) for bibcode in imported_bibcodes],
+            )
+        # Other threads may have filled the caches while this was being committed,
+        # without seeing its changes, so we clear them now that those are visible.
+        self._clear_caches()
+
+        # Then write the failures to a file, with a header explaining it. If there were
+        # no failures, remove the failure file from any previous import of this file.
+        failure_file_loc = self._failure_file_loc(file_name)
+        if results["failure"] > 0:
+            with open(failure_file_loc, "w", encoding="utf-8") as failure_file:
+                failure_file.write(_FAILURE_FILE_HEADER)
+                failure_file.writelines(failures)
+        else:
+            if failure_file_loc.is_file():
+                failure_file_loc.unlink()
             failure_file_loc = None
 
         return (
@@ -851,27 +1379,31 @@ class Database(object):
         name = bibtex_file_loc.stem + ".failures" + bibtex_file_loc.suffix
         return directory / name
 
-    def _parse_bibtex_entry(self, entry, tag_name, failure_file):
+    def _parse_bibtex_entry(self, entry, failures, lookup):
         """
         Wrapper around the function to parse a single bibtex entry and add it to the db
 
         This also identifies what happened with success vs failure by returning one of
-        three strings: "success", "failure", or "duplicate"
+        three strings: "success", "failure", or "duplicate", along with the bibcode of
+        the paper (which will be None for failures).
 
         :param entry: the bibtex entry to add
         :type entry: str
-        :param tag_name: tag to apply to the paper if added successfully
-        :type tag_name: str
-        :param failure_file: file object to write any failed bibtex entries to
-        :type failure_file: io.TextIO
-        :return: String indicating what happened
-        :rtype: str
+        :param failures: list of failed bibtex entries, which this entry will be
+                         added to if it fails, along with the reason
+        :type failures: list
+        :param lookup: the lookup of this entry's bibcode, from _start_bibtex_lookup
+        :type lookup: concurrent.futures.Future
+        :return: String indicating what happened, and the bibcode of the paper
+        :rtype: tuple
         """
+        # this raises any errors from parsing the entry or finding the paper
         try:
-            self._parse_bibtex_entry_inner(entry, tag_name)
-            return "success"
+            paper_data, bibcode = lookup.result()
+            bibcode = self._parse_bibtex_entry_inner(paper_data, bibcode)
+            return "success", bibcode
         except PaperAlreadyInDatabaseError:
-            return "duplicate"
+            return "duplicate", bibcode
         except Exception as e:  # any other error
             # add to failure file, with the error
             # make non useful errors more useful
@@ -889,94 +1421,177 @@ class Database(object):
                 e = "something appears wrong with the format of this entry"
             elif "Max retries exceeded with url" in e:
                 e = "No internet connection"
-            failure_file.write(f"% {e}\n")
-            failure_file.write(entry + "\n")
-            return "failure"
+            failures.append(f"% {e}\n{entry}\n")
+            return "failure", None
 
-    def _parse_bibtex_entry_inner(self, entry, tag_name):
+    def _start_bibtex_lookup(self, executor, entry, bibcode_cache, existing_bibcodes):
         """
-        Handle a single bibtex entry and add it to the database
+        Parse a bibtex entry, then start looking up its bibcode in the background
 
-        :param entry: the bibtex entry to add
+        :param executor: The executor to look up the bibcode in
+        :type executor: concurrent.futures.Executor
+        :param entry: the bibtex entry to look up
         :type entry: str
-        :param tag_name: tag to apply to the paper if added successfully
-        :type tag_name: str
-        :return: None
+        :param bibcode_cache: dictionary holding the results of earlier lookups of
+                              the bibcode in this import, which will be updated.
+        :type bibcode_cache: dict
+        :param existing_bibcodes: bibcodes of the papers in the library when the
+                                  import started
+        :type existing_bibcodes: frozenset
+        :return: The lookup, which will hold a tuple of the parsed bibtex entry and
+                 the bibcode, or the error raised when parsing or finding the paper.
+        :rtype: concurrent.futures.Future
         """
-        # Start by parsing the entry to get paper data. We'll then use this to find
-        # the paper
+        # The parsing is quick, so we do it here rather than in the background
+        try:
+            paper_data = self._parse_bibtex_fields(entry)
+        except Exception as e:
+            lookup = Future()
+            lookup.set_exception(e)
+            return lookup
+        return executor.submit(
+            self._lookup_bibtex_entry, paper_data, bibcode_cache, existing_bibcodes
+        )
 
+    @staticmethod
+    def _parse_bibtex_fields(entry):
+        """
+        Parse a single bibtex entry into a dictionary of its fields
+
+        :param entry: the bibtex entry to parse
+        :type entry: str
+        :return: Dictionary of the fields of this entry, with formatting removed
+        :rtype: dict
+        """
         paper_data = bibtexparser.loads(entry).entries[0]
         # replace newlines and nonbreaking spaces.
         # Also replace quotes, since those mess up the query syntax.
         # I do keep curly braces
         # Also remove all accents, since they cause problems
-        accents = [
-            "\\`",
-            "\\'",
-            "\\^",
-            '\\"',
-            "\\~",
-            "\\=",
-            "\\.",
-            "\\u",
-            "\\v",
-            "\\H",
-            "\\t",
-            "\\c",
-            "\\d",
-            "\\b",
-            "\\k",
-        ]
         for key, value in paper_data.items():
             # need to replace accents before removing other formatting, so there isn't
             # any accidental overlap between the two. But first, need to fix the
-            # dotless i
-            value = value.replace("\\i", "i")
-            for c in accents:
-                # first replace times where there is a space after the accent character
-                value = value.replace(c + " ", "")
-                value = value.replace(c, "")
-            value = (
-                value.replace("\n", " ")
-                .strip()
-                .replace("~", " ")
-                .replace('"', "")
-                .replace("{", "")
-                .replace("}", "")
-            )
+            # dotless i. Both of these start with a backslash, so most values (which
+            # have none) can skip them
+            if "\\" in value:
+                value = value.replace("\\i", "i")
+                value = _BIBTEX_ACCENT.sub("", value)
+            value = value.replace("\n", " ").strip().translate(_BIBTEX_VALUE_TABLE)
             paper_data[key] = value
+        return paper_data
+
+    def _lookup_bibtex_entry(self, paper_data, bibcode_cache, existing_bibcodes):
+        """
+        Find the bibcode of the paper in a bibtex entry
+
+        This runs in a background thread, so it doesn't use the database.
+
+        :param paper_data: the parsed bibtex entry, from _parse_bibtex_fields
+        :type paper_data: dict
+        :param bibcode_cache: dictionary holding the results of earlier lookups of
+                              the bibcode in this import, which will be updated.
+        :type bibcode_cache: dict
+        :param existing_bibcodes: bibcodes of the papers in the library when the
+                                  import started
+        :type existing_bibcodes: frozenset
+        :return: The parsed bibtex entry and the bibcode of the paper
+        :rtype: tuple
+        """
+        # The ADS URL contains the bibcode, so if that paper is already in the library
+        # we don't need to ask ADS about it. This makes importing a file again much
+        # faster
+        if "adsurl" in paper_data:
+            try:
+                bibcode = ads_call.bibcode_from_ads_url(paper_data["adsurl"])
+                if bibcode in existing_bibcodes:
+                    return paper_data, bibcode
+            except (ValueError, IndexError):  # not a normal ADS URL, ADS may know it
+                pass
+
         # now that we have the info, try to find the paper. I'll keep track of what was
         # tried, then use that to construct an error message if needed. I try the ADS
         # url first, since that results in less queries to ADS, speeding up this
         # process
-        error_message = ""
-        for bibcode_func in [
-            self._get_bibcode_from_adsurl,
-            self._get_bibcode_from_doi,
-            self._get_bibcode_from_eprint,
-            self._get_bibcode_from_journal,
-        ]:
-            try:
-                bibcode = bibcode_func(paper_data)
+        # The same paper may be cited more than once in a file, so we keep the result
+        # of each lookup (including failures) for the rest of the import. These are
+        # stored by the fields of the entry each lookup uses.
+        journal_fields = ["year", "title", "volume", "page", "pages", "journal"]
+        journal_fields += ["author", "authors"]
+        # Only try the ADS url, DOI, and arXiv ID if the entry has them, rather than
+        # letting those lookups fail. The journal info is always tried last.
+        bibcode_funcs = [
+            (bibcode_func, [field])
+            for field, bibcode_func in [
+                ("adsurl", self._get_bibcode_from_adsurl),
+                ("doi", self._get_bibcode_from_doi),
+                ("eprint", self._get_bibcode_from_eprint),
+            ]
+            if field in paper_data
+        ]
+        bibcode_funcs.append((self._get_bibcode_from_journal, journal_fields))
+        error_messages = []
+        for bibcode_func, key_fields in bibcode_funcs:
+            key = (bibcode_func.__name__,) + tuple(
+                paper_data.get(f) for f in key_fields
+            )
+            # Lookups run in parallel, so the cache holds the (possibly unfinished)
+            # lookup. setdefault is atomic, so only one thread will do each lookup,
+            # while the others wait for its result.
+            this_lookup = Future()
+            cached_lookup = bibcode_cache.setdefault(key, this_lookup)
+            if cached_lookup is this_lookup:
+                try:
+                    this_lookup.set_result((bibcode_func(paper_data), None))
+                except Exception as e:
+                    this_lookup.set_result((None, e))
+            bibcode, error = cached_lookup.result()
+            if error is None:
                 break
-            except Exception as e:
-                # add this to the error message
-                if error_message != "" and str(e) != "":
-                    error_message += ", "
-                error_message += str(e)
+            # add this to the error message, skipping empty messages
+            if str(error) != "":
+                error_messages.append(str(error))
         else:  # no break, so the bibcode was not found
             # the bibcode_from_journal function always gives an error message, so we
             # so not need a default error message
-            raise ValueError(error_message)
+            raise ValueError(", ".join(error_messages))
 
+        # Adding the paper will need its details from ADS. Those are cached, so we
+        # get them now while we're running in the background. We don't need to for
+        # papers already in the library. Any errors here will happen again when the
+        # paper is added, so we can ignore them now.
         try:
-            self.add_paper(bibcode)
-        except PaperAlreadyInDatabaseError:
-            # catch this just to add the tag, then raise it again so the parent function
-            # can catch this esception
-            self.tag_paper(bibcode, tag_name)
-            raise PaperAlreadyInDatabaseError
+            if bibcode not in existing_bibcodes:
+                ads_call.get_info(ads_call.get_bibcode(bibcode))
+        except Exception:
+            pass
+        return paper_data, bibcode
+
+    def _parse_bibtex_entry_inner(self, paper_data, bibcode):
+        """
+        Add the paper from a single bibtex entry to the database
+
+        The tags of the paper are changed by import_bibtex once all the entries are
+        added.
+
+        :param paper_data: the parsed bibtex entry, from _parse_bibtex_fields
+        :type paper_data: dict
+        :param bibcode: the bibcode of the paper in this entry
+        :type bibcode: str
+        :return: the bibcode the paper was added with, which may be newer than the
+                 one given if ADS has updated it
+        :rtype: str
+        :raises: PaperAlreadyInDatabaseError if paper is already in the library
+        """
+        # If the paper is already in the library, we're done. Checking here rather
+        # than letting add_paper do it means we don't need to ask ADS about it, which
+        # add_paper would for arXiv papers, to see if they've been published.
+        if self.paper_exists(bibcode):
+            raise PaperAlreadyInDatabaseError("Already in Library.")
+        # Papers added here are not marked as unread. I'm assuming that if they're
+        # importing from a bibtex file, they've already read the paper, while if
+        # they're adding from ADS, that may not be the case. Note that duplicates
+        # already existed, so if they were unread that stays.
+        bibcode = self.add_paper(bibcode, tag_unread=False)
 
         # I attempted to validate that the properties in the bibtex entry matched
         # what the query returned, but I gave up on this. The journal often has
@@ -986,18 +1601,7 @@ class Database(object):
         # or the arXiv ID from the bibtex entry. With one of those, we assume that the
         # paper details are correct.
 
-        # if we got here, the paper was added successfully. Remove unread, if present.
-        # I'm assuming that if they're importing from a bibtex file, they've already
-        # read the paper, while if they're adding from ADS, that may not be the case.
-        # Not that duplicates already exited, so if they were unread that stays.
-        # Also add the special tag
-        current_tags = self.get_paper_tags(bibcode)
-        for c_tag in current_tags:
-            if c_tag.lower() == "unread":
-                self.untag_paper(bibcode, c_tag)
-        self.tag_paper(bibcode, tag_name)
-
-        # Also add the citation keyword for new papers. Again, if the paper is already
+        # Also add the citation keyword for new papers. If the paper is already
         # in the library, we don't mess with its cite key
         # don't bother changing it if there would be no change
         if paper_data["ID"] != bibcode:
@@ -1005,6 +1609,7 @@ class Database(object):
                 self.set_paper_attribute(bibcode, "citation_keyword", paper_data["ID"])
             except RuntimeError:  # duplicate citation key
                 pass  # just leave as the bibcode
+        return bibcode
 
     def _get_bibcode_from_adsurl(self, paper_data):
         """
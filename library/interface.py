@@ -14,6 +14,7 @@ from PySide6.QtCore import (
     QObject,
     Slot,
     Signal,
+    QByteArray,
 )
 from PySide6.QtGui import (
     QFontDatabase,
@@ -97,7 +98,7 @@ def qss_trigger(widget, property, value):
 # I tried to make the signals be just in the Worker object, but due to the way Qt is
 # implemented that doesn't work. So they need a separate class
 class WorkerSignals(QObject):
-    finished = Signal(tuple)
+    finished = Signal(object)
     progress = Signal(int)
 
 
@@ -168,6 +169,8 @@ class LeftPanelTag(QWidget):
         # also store some other info
         self.name = tagName
         self.main = main
+        # the papers shown the last time this tag was clicked
+        self.shownBibcodes = None
         # make sure the tag is unhighlighted. This first thing ensures that changes
         # are actually shown in the interface. Not sure why this is not automatically
         # set
@@ -186,15 +189,44 @@ class LeftPanelTag(QWidget):
         """
         When the tag is clicked on, show the papers with that tag in the central panel
 
-        :param _: Dummy parameter that contains the event type. Not used here, we do
-                  the same thing for every click type.
         :return: None
         """
-        for paper in self.main.papersList.getPapers():
-            if self.main.db.paper_has_tag(paper.bibcode, self.name):
-                paper.show()
-            else:
-                paper.hide()
+        self.showPapers()
+
+    def showPapers(self, force=False):
+        """
+        Show the papers with this tag in the central panel, and highlight this tag
+
+        :param force: Whether to go through all the papers even if this tag is already
+                      showing them. This is needed when refreshing the papers shown,
+                      since papers may have been added to the list or changed tags.
+        :type force: bool
+        :return: None
+        """
+        # get all the papers with this tag in one query, rather than checking each paper
+        bibcodes = self.main.db.get_papers_with_tag(self.name)
+        # If the user clicks on this tag when it's already showing these papers (like
+        # with a double click), there's nothing to change.
+        if (
+            not force
+            and self.property("is_highlighted")
+            and bibcodes == self.shownBibcodes
+        ):
+            return
+        self.shownBibcodes = bibcodes
+        # Turn off repainting while showing and hiding papers, so the papers list is
+        # only laid out and repainted once at the end, rather than for every paper.
+        # Repainting is always turned back on, so the list isn't left frozen if
+        # something goes wrong
+        self.main.papersList.setUpdatesEnabled(False)
+        try:
+            for paper in self.main.papersList.getPapers():
+                if paper.bibcode in bibcodes:
+                    paper.show()
+                else:
+                    paper.hide()
+        finally:
+            self.main.papersList.setUpdatesEnabled(True)
 
         # Visually highlight this tag, and remove highlighting on other tags
         for tag in self.main.tagsList.tags:
@@ -262,14 +294,22 @@ class LeftPanelTagShowAll(LeftPanelTag):
         # this starts highlighted
         self.highlight()
 
-    def mousePressEvent(self, _):
+    def showPapers(self, force=False):
         """
-        When this is clicked on, show all papers
+        Show all papers, and highlight this tag
 
+        :param force: Not used, since all papers are always shown. This is kept to
+                      match LeftPanelTag.showPapers.
+        :type force: bool
         :return: None
         """
-        for paper in self.main.papersList.getPapers():
-            paper.show()
+        # don't repaint for every paper, see LeftPanelTag.showPapers
+        self.main.papersList.setUpdatesEnabled(False)
+        try:
+            for paper in self.main.papersList.getPapers():
+                paper.show()
+        finally:
+            self.main.papersList.setUpdatesEnabled(True)
         # Visually highlight this tag, and remove highlighting on other tags
         for tag in self.main.tagsList.tags:
             tag.unhighlight()
@@ -281,7 +321,7 @@ class Paper(QWidget):
     Class holding paper details that goes in the central panel
     """
 
-    def __init__(self, bibcode, main):
+    def __init__(self, bibcode, main, title=None, cite_string=None):
         """
         Initialize the paper object, which will hold the given bibcode
 
@@ -289,6 +329,12 @@ class Paper(QWidget):
         :type bibcode: str
         :param main: the main widget, which we'll use to access other widgets
         :type main: MainWindow
+        :param title: The title of this paper. If not passed, this is gotten from the
+                      database. Passing it saves a query when making many papers.
+        :type title: str
+        :param cite_string: The cite string of this paper. If not passed, this is
+                            gotten from the database.
+        :type cite_string: str
         """
         QWidget.__init__(self)
 
@@ -298,8 +344,12 @@ class Paper(QWidget):
 
         # Then set up the layout this uses. It will be vertical with the title (for now)
         vBox = QVBoxLayout()
-        self.titleText = QLabel(self.main.db.get_paper_attribute(self.bibcode, "title"))
-        self.citeText = QLabel(self.main.db.get_cite_string(self.bibcode))
+        if title is None:
+            title = self.main.db.get_paper_attribute(self.bibcode, "title")
+        if cite_string is None:
+            cite_string = self.main.db.get_cite_string(self.bibcode)
+        self.titleText = QLabel(title)
+        self.citeText = QLabel(cite_string)
 
         # name these for stylesheets
         self.titleText.setObjectName("center_panel_paper_title")
@@ -307,12 +357,19 @@ class Paper(QWidget):
         # and let the text wrap
         self.titleText.setWordWrap(True)
         self.citeText.setWordWrap(True)
+        # The cite string never has any formatting, so tell Qt that rather than
+        # having it check for rich text. Titles from ADS can have sub/superscripts,
+        # so those are left alone.
+        self.citeText.setTextFormat(Qt.PlainText)
 
         # make sure the paper is unhighlighted. This first thing ensures that changes
         # are actually shown in the interface. Not sure why this is not automatically
-        # set
+        # set. The widgets haven't been styled yet, so we just set the property rather
+        # than calling unhighlight, which would restyle them. They'll be styled with
+        # this property once shown. This saves a lot of time with many papers.
         self.setAttribute(Qt.WA_StyledBackground, True)
-        self.unhighlight()
+        for widget in [self, self.titleText, self.citeText]:
+            widget.setProperty("is_highlighted", False)
 
         # then add these to the layout, then set this layout
         vBox.addWidget(self.titleText)
@@ -357,15 +414,10 @@ class Paper(QWidget):
 
         :return: None
         """
-        self.main.rightPanel.validatePDFPath()
-        local_file = self.main.db.get_paper_attribute(self.bibcode, "local_file")
-        # local_file will either be None or an existing file
-        # if there is no file, highlight for the user where they can add the file
-        if local_file is None:
+        # open the file. This function handles error checking. If there is no file,
+        # highlight for the user where they can add the file
+        if not self.main.rightPanel.openPDF():
             self.main.rightPanel.highlightPDFButtons()
-        else:
-            # open the file. This function handles error checking
-            self.main.rightPanel.openPDF()
 
     def getTags(self):
         """
@@ -505,9 +557,12 @@ class ScrollArea(QScrollArea):
         :return: None
         """
         # get the new size, and apply it to all widgets in the layout. Have some
-        # padding on either size to avoid horizontal scroll bars
-        new_width = resize_event.size().width() - self.offset
-        self.resize_items_in_layout(self.layout(), new_width)
+        # padding on either size to avoid horizontal scroll bars. This goes through
+        # every widget, so skip it if only the height changed (e.g. when the window is
+        # made taller).
+        if resize_event.size().width() != resize_event.oldSize().width():
+            new_width = resize_event.size().width() - self.offset
+            self.resize_items_in_layout(self.layout(), new_width)
 
         # Then do the normal resizing
         super().resizeEvent(resize_event)
@@ -551,6 +606,9 @@ class RightPanel(ScrollArea):
 
         self.main = main
         self.bibcode = ""  # will be set later
+        # PDFs for different papers are often kept in the same place, so the dialogs to
+        # pick PDFs start wherever the user last put one
+        self.pdfDirectory = Path.home()
 
         # for clarity set text to empty, the default values will be set below
         self.titleText = QLabel("")
@@ -580,6 +638,11 @@ class RightPanel(ScrollArea):
         self.titleText.setTextInteractionFlags(Qt.TextSelectableByMouse)
         self.citeText.setTextInteractionFlags(Qt.TextSelectableByMouse)
         self.abstractText.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        # These labels never have any formatting, so Qt doesn't need to check each
+        # new text for rich text. Titles and abstracts from ADS can have sub and
+        # superscripts, so those are left alone.
+        self.citeText.setTextFormat(Qt.PlainText)
+        self.tagText.setTextFormat(Qt.PlainText)
 
         # have buttons to hide and show the list of tag checkboxes
         self.editTagsButton = QPushButton("Edit Tags")
@@ -598,6 +661,7 @@ class RightPanel(ScrollArea):
         # have buttons to edit the citation keyword
         self.citeKeyText = QLabel("")
         self.citeKeyText.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.citeKeyText.setTextFormat(Qt.PlainText)
         self.editCiteKeyButton = QPushButton("Edit Citation Keyword")
         self.editCiteKeyEntry = EasyExitLineEdit(
             self.resetCiteTextButtons, self.changeCiteKey
@@ -610,6 +674,7 @@ class RightPanel(ScrollArea):
         # have buttons for the local PDF file
         self.pdfText = QLabel("")
         self.pdfText.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.pdfText.setTextFormat(Qt.PlainText)
         self.pdfOpenButton = QPushButton("Open this paper's PDF")
         self.pdfOpenButton.clicked.connect(self.openPDF)
         self.pdfChooseLocalFileButton = QPushButton("Choose a local PDF")
@@ -622,9 +687,9 @@ class RightPanel(ScrollArea):
         # have some horizontal lines to visually distinguish sections
         self.spacers = [HorizontalLine() for _ in range(5)]
 
-        # the Tags List has a bit of setup
+        # the Tags List has a bit of setup. The tag checkboxes are made when setting
+        # the initial state, as resetPaperDetails fills the tags list
         self.vBoxTags = QVBoxLayout()
-        self.populate_tags()
 
         # handle the initial state
         self.resetPaperDetails()
@@ -678,37 +743,43 @@ class RightPanel(ScrollArea):
         """
         return [self.vBoxTags.itemAt(i).widget() for i in range(self.vBoxTags.count())]
 
-    def populate_tags(self):
+    def populate_tags(self, paper_tags=None):
         """
         Reset the list of tags shown in the right panel, to account for any new ones.
 
         This checks checkboxes based on the paper currently shown, and hides or shows
         the checkboxes appropriately
 
+        :param paper_tags: The tags the paper currently shown has. If not passed, these
+                           are gotten from the database.
+        :type paper_tags: list
         :return: None
         """
-        # first remove all tags from the layout, then we'll go back and add
-        # everything in order
-        previous_tags = self.getTagCheckboxes()
+        # Keep track of the checkboxes already there by their name, so we can find
+        # them for each tag without searching through all of them
+        previous_tags = {t.text(): t for t in self.getTagCheckboxes()}
+        # get the tags this paper has all at once, rather than asking the database
+        # about each tag separately. Tag names are not case sensitive.
+        if self.bibcode != "":
+            if paper_tags is None:
+                paper_tags = self.main.db.get_paper_tags(self.bibcode)
+            paper_tags = {t.lower() for t in paper_tags}
 
         # go through the database and add checkboxes for each tag there.
         for idx, t_name in enumerate(self.main.db.get_all_tags()):
-            # see if it exists
-            for this_tag_checkbox in previous_tags:
-                if this_tag_checkbox.text() == t_name:
-                    # remove this from the list, since we found it. We'll delete ones
-                    # we didn't find later.
-                    previous_tags.remove(this_tag_checkbox)
-                    break
-            else:  # not found
+            # see if it exists. If so, remove this from the dictionary, since we found
+            # it. We'll delete ones we didn't find later.
+            this_tag_checkbox = previous_tags.pop(t_name, None)
+            if this_tag_checkbox is None:  # not found
                 this_tag_checkbox = TagCheckBox(t_name, self.main)
                 self.vBoxTags.insertWidget(idx, this_tag_checkbox)
             # see whether we can check this box
+            # Block the signals while doing this, otherwise checking the box would tag
+            # the paper in the database, even though it already has this tag
             if self.bibcode != "":
-                if self.main.db.paper_has_tag(self.bibcode, t_name):
-                    this_tag_checkbox.setChecked(True)
-                else:
-                    this_tag_checkbox.setChecked(False)
+                this_tag_checkbox.blockSignals(True)
+                this_tag_checkbox.setChecked(t_name.lower() in paper_tags)
+                this_tag_checkbox.blockSignals(False)
 
             # see whether to hide or show the tags
             if self.doneEditingTagsButton.isHidden():
@@ -716,7 +787,7 @@ class RightPanel(ScrollArea):
             else:
                 this_tag_checkbox.show()
         # any leftover tags must be removed
-        for t in previous_tags:
+        for t in previous_tags.values():
             t.hide()
             self.vBoxTags.removeWidget(t)
             del t
@@ -770,19 +841,23 @@ class RightPanel(ScrollArea):
         if self.bibcode == bibcode:
             return
         self.bibcode = bibcode
-        self.titleText.setText(self.main.db.get_paper_attribute(self.bibcode, "title"))
-        self.citeText.setText(self.main.db.get_cite_string(self.bibcode))
-        self.abstractText.setText(
-            self.main.db.get_paper_attribute(self.bibcode, "abstract")
+        # get everything needed from the database at once, rather than separately
+        paper_data = self.main.db.get_paper_attributes(
+            self.bibcode,
+            ["title", "abstract", "user_notes", "local_file", "citation_keyword"],
         )
-        self.update_tag_text()
-        self.updateNotesText()
+        paper_tags = self.main.db.get_paper_tags(self.bibcode)
+        self.titleText.setText(paper_data["title"])
+        self.citeText.setText(self.main.db.get_cite_string(self.bibcode))
+        self.abstractText.setText(paper_data["abstract"])
+        self.update_tag_text(paper_tags)
+        self.showNotesText(paper_data["user_notes"])
 
         # then make all the buttons appear, since they will be hidden at the start
         self.unhighlightPDFButtons()
         self.pdfText.show()
         self.pdfDownloadButton.setText("Download the PDF")
-        self.validatePDFPath()  # handles PDF buttons
+        self.showPDFPath(paper_data["local_file"])  # handles PDF buttons
         # tags
         self.editTagsButton.show()
         self.doneEditingTagsButton.hide()
@@ -796,8 +871,7 @@ class RightPanel(ScrollArea):
         self.userNotesTextEditButton.show()
         # and the bibtex buttons
         self.citeKeyText.show()
-        cite_key = self.main.db.get_paper_attribute(self.bibcode, "citation_keyword")
-        self.citeKeyText.setText(f"Citation Keyword: {cite_key}")
+        self.citeKeyText.setText(f"Citation Keyword: {paper_data['citation_keyword']}")
         self.editCiteKeyButton.show()
         self.editCiteKeyEntry.hide()
         self.copyBibtexButton.show()
@@ -808,19 +882,23 @@ class RightPanel(ScrollArea):
         # Go through and set the checkboxes to match the tags the paper has. This
         # needs to be done after hiding everything so we can detect whether or not
         # to show the checkboxes
-        self.populate_tags()
+        self.populate_tags(paper_tags)
 
         # scroll to the top so the title is visible
         self.verticalScrollBar().setValue(0)
         self.horizontalScrollBar().setValue(0)
 
-    def update_tag_text(self):
+    def update_tag_text(self, tags_list=None):
         """
         Put the appropriate tags in the list of tags this paper has
 
+        :param tags_list: The tags this paper has. If not passed, these are gotten
+                          from the database.
+        :type tags_list: list
         :return: None
         """
-        tags_list = self.main.db.get_paper_tags(self.bibcode)
+        if tags_list is None:
+            tags_list = self.main.db.get_paper_tags(self.bibcode)
         if len(tags_list) > 0:
             self.tagText.setText(f"Tags: {', '.join(tags_list)}")
         else:
@@ -853,12 +931,11 @@ class RightPanel(ScrollArea):
             tag.hide()
         # Also update the text shown to the user
         self.update_tag_text()
-        # also reset the papers shown in the center panel, by mocking a click on the
-        # tag that is currently highlighted
+        # also reset the papers shown in the center panel, by showing the papers of
+        # the tag that is currently highlighted again
         for tag in self.main.tagsList.tags:
             if tag.property("is_highlighted"):
-                # the mousePressEvent takes a dummy parameter
-                tag.mousePressEvent(None)
+                tag.showPapers(force=True)
 
     def changeTags(self, tagName, checked):
         """
@@ -938,7 +1015,16 @@ class RightPanel(ScrollArea):
 
         :return: None
         """
-        notes_text = self.main.db.get_paper_attribute(self.bibcode, "user_notes")
+        self.showNotesText(self.main.db.get_paper_attribute(self.bibcode, "user_notes"))
+
+    def showNotesText(self, notes_text):
+        """
+        Show the given user notes. Use default value if empty.
+
+        :param notes_text: The user notes of the paper currently shown
+        :type notes_text: str
+        :return: None
+        """
         if notes_text is None or len(notes_text.strip()) == 0:
             notes_text = "No notes yet"
         self.userNotesText.setText(notes_text)
@@ -1057,9 +1143,25 @@ class RightPanel(ScrollArea):
         Allowed values are None and existing files. If it is a non-existent pdf, the
         value will be replaced with None
 
-        :return: None
+        :return: The path to the PDF, or None if there isn't a valid one
+        :rtype: str
+        """
+        return self.showPDFPath(
+            self.main.db.get_paper_attribute(self.bibcode, "local_file")
+        )
+
+    def showPDFPath(self, local_file):
+        """
+        Show the location of the PDF of the current paper, if it points to a real pdf
+
+        Allowed values are None and existing files. If it is a non-existent pdf, the
+        value will be replaced with None in the database
+
+        :param local_file: The local_file attribute of the paper currently shown
+        :type local_file: str
+        :return: The path to the PDF, or None if there isn't a valid one
+        :rtype: str
         """
-        local_file = self.main.db.get_paper_attribute(self.bibcode, "local_file")
         # if it does not exist, replace it
         if local_file is not None and not Path(local_file).is_file():
             self.main.db.set_paper_attribute(self.bibcode, "local_file", None)
@@ -1080,6 +1182,7 @@ class RightPanel(ScrollArea):
             self.pdfClearButton.show()
             self.pdfChooseLocalFileButton.hide()
             self.pdfDownloadButton.hide()
+        return local_file
 
     def userChooseLocalPDF(self):
         """
@@ -1096,12 +1199,13 @@ class RightPanel(ScrollArea):
         # hits cancel it returns a two item tuple with two empty strings!
         local_file = QFileDialog.getOpenFileName(
             filter="PDF(*.pdf)",
-            dir=str(Path.home()),
+            dir=str(self.pdfDirectory),
         )[0]
         # If the user doesn't select anything this returns the empty string.
         # Otherwise this returns a two item tuple, where the first item is the
         # absolute path to the file they picked
         if local_file != "":
+            self.pdfDirectory = Path(local_file).parent
             self.main.db.set_paper_attribute(self.bibcode, "local_file", local_file)
             self.validatePDFPath()  # handles buttons and whatnot
 
@@ -1109,14 +1213,16 @@ class RightPanel(ScrollArea):
         """
         Open the local PDF set for this paper
 
-        :return: None
+        :return: Whether or not there was a PDF to open
+        :rtype: bool
         """
-        # first validate
-        self.validatePDFPath()
+        # first validate. This gives the path if it's valid
+        local_file = self.validatePDFPath()
         # if it's valid, open the file
-        local_file = self.main.db.get_paper_attribute(self.bibcode, "local_file")
         if local_file is not None:
             QDesktopServices.openUrl(f"file:{local_file}")
+            return True
+        return False
 
     def downloadPDF(self):
         """
@@ -1154,7 +1260,9 @@ class RightPanel(ScrollArea):
         # we found the right URL, now ask the user where to download
         local_file = QFileDialog.getSaveFileName(
             caption="Select where to save this pdf",
-            dir=str(Path.home() / self.main.db.get_machine_cite_string(self.bibcode))
+            dir=str(
+                self.pdfDirectory / self.main.db.get_machine_cite_string(self.bibcode)
+            )
             + ".pdf",
         )[0]
 
@@ -1164,6 +1272,7 @@ class RightPanel(ScrollArea):
         # make sure it ends in .pdf
         if not local_file.endswith(".pdf"):
             local_file = local_file + ".pdf"
+        self.pdfDirectory = Path(local_file).parent
 
         # then download
         self._downloadURL(this_url, local_file)
@@ -1264,15 +1373,25 @@ class PapersListScrollArea(ScrollArea):
         # the papersList. That will allow it to float on top
         self.sortChooser.setParent(self)
 
-        # initially sort by date
+        # initially sort by date. Sort keys are stored for each sort type
+        self.sortKeyCache = dict()
         self.changeSort()
 
-        # add all the papers
-        for b in self.main.db.get_all_bibcodes():
-            # pass click=False so we leave the right panel blank
-            self.addPaper(b, click=False)
-        # then sort all the papers. They were not sorted when initially added
-        self.sortPapers()
+        # add all the papers. Rather than adding them then sorting (which removes and
+        # re-adds every paper to the layout), I sort them first, then add them to the
+        # layout in that order. I also turn off repainting while adding them, so Qt
+        # doesn't redo the layout after every paper.
+        # The text for all papers is gotten from the database at once.
+        papers = [
+            Paper(bibcode, self.main, title, cite_string)
+            for bibcode, (title, cite_string) in (
+                self.main.db.get_all_titles_and_cite_strings().items()
+            )
+        ]
+        self.setUpdatesEnabled(False)
+        for paper in sorted(papers, key=self.sortKey):
+            self.addWidget(paper)
+        self.setUpdatesEnabled(True)
 
     def getPapers(self):
         """
@@ -1302,19 +1421,16 @@ class PapersListScrollArea(ScrollArea):
 
         # create the paper object, than add to the list and center panel
         paper = Paper(bibcode, self.main)
-        self.addWidget(paper)  # calls the ScrollArea addWidget
+
+        # The papers are already sorted, so we put this paper in its place rather
+        # than sorting all of them again, which redoes the whole layout
+        self.layout().insertWidget(self.sortedIndex(paper), paper)
 
         # click on this paper, and scroll to where it is. We do not do this at the
         # beginning when adding papers initially, but otherwise do it whenever a user
         # adds a paper.
         # This is actually tricky, since I need to fully mock a mouse event.
         if click:
-            # we do not sort when not clicking, since we do not click when adding all
-            # papers at the beginning, and to speed up the initial interface creation
-            # I don't want to sort each time a paper is added, just once they're all
-            # done
-            self.sortPapers()
-            # then click
             paper.singleClick()
             # Getting the paper to scroll properly was a hassle. For some reason the
             # plain ensureWidgetVisible call works during tests, but not the actual
@@ -1323,6 +1439,29 @@ class PapersListScrollArea(ScrollArea):
             self.ensureWidgetVisible(paper)
             QTimer.singleShot(0, lambda: self.ensureWidgetVisible(paper))
 
+    def sortedIndex(self, paper):
+        """
+        Find where a paper should go in the list of papers to keep them sorted
+
+        This assumes the papers already in the list are sorted. The paper will go after
+        any papers with the same sort key, as if it was added at the end and sorted.
+
+        :param paper: The paper to find the location of
+        :type paper: Paper
+        :return: The index in the layout where the paper should be inserted
+        :rtype: int
+        """
+        # do a binary search, so that we only need the sort keys of a few papers
+        key = self.sortKey(paper)
+        low, high = 0, self.layout().count()
+        while low < high:
+            mid = (low + high) // 2
+            if key < self.sortKey(self.layout().itemAt(mid).widget()):
+                high = mid
+            else:
+                low = mid + 1
+        return low
+
     def deletePaper(self, bibcode):
         """
         Delete a paper from this list of papers
@@ -1335,6 +1474,9 @@ class PapersListScrollArea(ScrollArea):
                 paper.hide()  # just to be safe
                 self.layout().removeWidget(paper)
                 del paper
+        # the paper may be added again later, with updated details
+        for key_cache in self.sortKeyCache.values():
+            key_cache.pop(bibcode, None)
 
     def sortPapers(self):
         """
@@ -1362,24 +1504,47 @@ class PapersListScrollArea(ScrollArea):
         text = self.sortChooser.currentText()
         if text == "Sort by Date":
             # Here we just sort by publication date
-            self.sortKey = lambda p: self.main.db.get_paper_attribute(
-                p.bibcode, "pubdate"
-            )
+            attributes = ["pubdate"]
+
+            def key(paper_data):
+                return paper_data["pubdate"]
+
         elif text == "Sort by First Author":
             # Here we have to do something a bit more complex. We sort by the author's
             # last name first, then by their first name (to try to distinguish between
             # authors with the same last name. Then within each author, we sort by the
             # year. To accomplish this, we return a three item tuple, as Python sorts
             # by comparing the first item of the tuple, then the second, etc.
-            def author_sort(p):
-                first_author = self.main.db.get_paper_attribute(p.bibcode, "authors")[0]
+            attributes = ["authors", "pubdate"]
+
+            def key(paper_data):
+                first_author = paper_data["authors"][0]
 
                 last_name = first_author.split(",")[0]
                 rest_of_name = ",".join(first_author.split(",")[1:]).strip()
-                year = self.main.db.get_paper_attribute(p.bibcode, "pubdate")
-                return last_name, rest_of_name, year
-
-            self.sortKey = author_sort
+                return last_name, rest_of_name, paper_data["pubdate"]
+
+        # The sort keys of a paper don't change, so I keep them to only get them from
+        # the database once for each paper, no matter how many times we sort
+        key_cache = self.sortKeyCache.setdefault(text, dict())
+
+        def cached_key(p):
+            if p.bibcode not in key_cache:
+                # The first time, get the keys of all papers in one query, rather than
+                # one query for each paper
+                if len(key_cache) == 0:
+                    for bibcode, paper_data in self.main.db.get_all_paper_attributes(
+                        attributes
+                    ).items():
+                        key_cache[bibcode] = key(paper_data)
+                # papers added later are gotten one at a time
+                if p.bibcode not in key_cache:
+                    key_cache[p.bibcode] = key(
+                        self.main.db.get_paper_attributes(p.bibcode, attributes)
+                    )
+            return key_cache[p.bibcode]
+
+        self.sortKey = cached_key
         self.sortPapers()
 
     def resizeEvent(self, resize_event):
@@ -1526,9 +1691,18 @@ class TagsListScrollArea(ScrollArea):
         self.addWidget(self.thirdDeleteTagCancelButton)
         self.addWidget(self.showAllButton)
 
-        # Then set up the list of tags itself
+        # Then set up the list of tags itself. I create them all at once, sort them
+        # once, and add them to the layout in that order, rather than adding them one
+        # at a time and reshuffling the layout for each one.
+        self.setUpdatesEnabled(False)
         for t in self.main.db.get_all_tags():
-            self.addTagInternal(t)
+            self.tags.append(LeftPanelTag(t, self.main))
+        self.tags.sort(key=lambda tag: tag.name.lower())
+        for tag in self.tags:
+            self.addWidget(tag)
+        self.setUpdatesEnabled(True)
+        if len(self.tags) > 0:
+            self.triggerResize()
 
         # adjust the spacing between elements (i.e. tags). To compensate, increase the
         # margins around the buttons at the top, so they're not right on top of each
@@ -1608,25 +1782,32 @@ class TagsListScrollArea(ScrollArea):
         :type tagName: str
         :return: None
         """
-        # check if this tag is already in the list. This should never happen
-        assert tagName not in [t.name for t in self.tags]
+        # We want the tags to be sorted (not case sensitive), so find where it goes in
+        # the already sorted list. It goes after any tags with the same sort key, as if
+        # it was added at the end and sorted. Do a binary search, so that we only need
+        # to look at a few tags
+        key = tagName.lower()
+        idx, high = 0, len(self.tags)
+        while idx < high:
+            mid = (idx + high) // 2
+            if key < self.tags[mid].name.lower():
+                high = mid
+            else:
+                idx = mid + 1
 
-        # create a tag object
-        new_tag = LeftPanelTag(tagName, self.main)
+        # check if this tag is already in the list. This should never happen. If it
+        # is, it will be with the tags just before, which have the same sort key
+        before = idx - 1
+        while before >= 0 and self.tags[before].name.lower() == key:
+            assert self.tags[before].name != tagName
+            before -= 1
 
-        # We then need to add it to the layout. We want the tags to be sorted. So what
-        # we do is remove all tags from the layout, figure out the sort order, then add
-        # everything back
-        for tag in self.tags:
-            self.layout().removeWidget(tag)
-        # then add the new tag to this list. (we don't do this first because we don't
-        # need to remove it
-        self.tags.append(new_tag)
-        # sort the tags by their name (not case sensitive)
-        self.tags = sorted(self.tags, key=lambda tag: tag.name.lower())
-        # then add them to the layout in this order
-        for tag in self.tags:
-            self.layout().addWidget(tag)
+        # create a tag object, then add it to the list and layout
+        new_tag = LeftPanelTag(tagName, self.main)
+        self.tags.insert(idx, new_tag)
+        # the tags are at the end of the layout, after all the buttons
+        n_buttons = self.layout().count() - (len(self.tags) - 1)
+        self.layout().insertWidget(n_buttons + idx, new_tag)
 
         # resize
         self.triggerResize()
@@ -1735,14 +1916,11 @@ class TagsListScrollArea(ScrollArea):
         # find the tag to remove it from the interface
         for tag in self.tags:
             if tag.label.text() == old_tag_name:
-                # if this tag was highlighted, show all papers
+                # if this tag was highlighted, show the papers of the renamed tag
                 if tag.property("is_highlighted"):
-                    # send a dummy mouse click. The argument here would normally be a
-                    # mouse click event, but since I don't use that in the function,
-                    # I can send a dummy parameter.
                     for tag_2 in self.tags:
                         if tag_2.label.text() == new_tag_name:
-                            tag_2.mousePressEvent(None)
+                            tag_2.showPapers(force=True)
                 # then handle deletion
                 tag.hide()  # just to be safe
                 self.tags.remove(tag)
@@ -1823,10 +2001,7 @@ class TagsListScrollArea(ScrollArea):
             if tag.label.text() == tag_to_delete:
                 # if this tag was highlighted, show all papers
                 if tag.property("is_highlighted"):
-                    # send a dummy mouse click. The argument here would normally be a
-                    # mouse click event, but since I don't use that in the function,
-                    # I can send a dummy parameter.
-                    self.showAllButton.mousePressEvent(None)
+                    self.showAllButton.showPapers(force=True)
                 # then handle deletion
                 tag.hide()  # just to be safe
                 self.tags.remove(tag)
@@ -2070,7 +2245,7 @@ class MainWindow(QMainWindow):
         self.db = db
 
         # add read and unread tags if there is nothing in the database
-        if len(self.db.get_all_bibcodes()) == 0 and len(self.db.get_all_tags()) == 0:
+        if self.db.num_papers() == 0 and len(self.db.get_all_tags()) == 0:
             db.add_new_tag("Unread")
 
         # Start with the layout. Our main layout is two vertical components:
@@ -2131,9 +2306,12 @@ class MainWindow(QMainWindow):
         qss_trigger(self.updateText, "error_text", True)
         # only show this if there is an update available. We'll use git fetch for this,
         # which will return an empty string if we're current, and some text if there
-        # is an update available.
-        if not self.updateAvailable():
-            self.updateText.hide()
+        # is an update available. This needs the internet, so it's done in another
+        # thread to not hold up the interface. The text is hidden until we know.
+        self.updateText.hide()
+        self.updateWorker = Worker(self.updateAvailable)
+        self.updateWorker.signals.finished.connect(self.updateText.setVisible)
+        self.threadpool.start(self.updateWorker)
 
         # have these quantities have a fixed height. These values are chosen to
         # make it look nice.
@@ -2194,18 +2372,66 @@ class MainWindow(QMainWindow):
         self.splitter.setSizes([200, 550, 350])
         self.show()
 
+    @Slot()
     def addPaper(self):
         """
         Add a paper to the database, taking text from the text box.
 
+        Adding a paper requires queries to ADS, so this is done in another thread to
+        keep the interface responsive. The search bar and add button are disabled
+        until that finishes, at which point finishAddPaper handles the result.
+
+        :return: None
+        """
+        self.searchBar.setEnabled(False)
+        self.addButton.setEnabled(False)
+        # An import would need to write to the database while this paper is being
+        # added, and could add this paper to the interface too, so wait for this first
+        self.importButton.setEnabled(False)
+        # keep a reference to the worker so it's not deleted while running
+        self.addWorker = Worker(self.addPaperToDatabase, self.searchBar.text())
+        self.addWorker.signals.finished.connect(self.finishAddPaper)
+        self.threadpool.start(self.addWorker)
+
+    def addPaperToDatabase(self, identifier):
+        """
+        Add a paper to the database, returning any errors rather than raising them
+
+        This is run in a separate thread, so errors need to be passed back to be
+        handled in the main thread.
+
+        :param identifier: The text the user put in the search bar
+        :type identifier: str
+        :return: The bibcode of the paper added (or None if there was an error), and
+                 the error raised (or None if the paper was added)
+        :rtype: tuple
+        """
+        try:
+            return self.db.add_paper(identifier), None
+        except Exception as e:
+            return None, e
+
+    def finishAddPaper(self, result):
+        """
+        Once a paper has been added to the database, put it into the interface
+
         If what is in the text box is not recognized, the text will not be cleared, and
         nothing will be added (obviously). If the paper is already in the library,
         the paper will not be added but the text will be cleared.
 
+        :param result: Output of addPaperToDatabase
+        :type result: tuple
         :return: None
         """
+        self.searchBar.setEnabled(True)
+        self.addButton.setEnabled(True)
+        self.importButton.setEnabled(True)
+        self.searchBar.setFocus()
+
+        bibcode, error = result
         try:  # see if the user put something good
-            bibcode = self.db.add_paper(self.searchBar.text())
+            if error is not None:
+                raise error
         except ValueError:  # will be raised if the value isn't recognized
             self.formatSearchBarError(
                 "This paper was not found in ADS. "
@@ -2327,7 +2553,8 @@ class MainWindow(QMainWindow):
         # handle the initial state of the progressbar, including setting the maximum val
         self.importProgressBar.setValue(0)
         n_lines = 0
-        with open(file_loc, "r") as in_file:
+        # BibTeX files are UTF-8, so read it that way, as Database.import_bibtex does
+        with open(file_loc, "r", encoding="utf-8") as in_file:
             for line in in_file:
                 n_lines += 1
         self.importProgressBar.setMaximum(n_lines)
@@ -2359,9 +2586,13 @@ class MainWindow(QMainWindow):
         # this just adds papers to the database, and doesn't add them to the interface.
         # We must figure out which papers are new and add them
         current_bibcodes = set([p.bibcode for p in self.papersList.getPapers()])
-        for bibcode in self.db.get_all_bibcodes():
-            if bibcode not in current_bibcodes:
-                self.papersList.addPaper(bibcode)
+        new_bibcodes = [
+            b for b in self.db.get_all_bibcodes() if b not in current_bibcodes
+        ]
+        # Only the last paper needs to be clicked on, since clicking on each one would
+        # fill in the right panel for every paper, only to replace it with the next
+        for idx, bibcode in enumerate(new_bibcodes):
+            self.papersList.addPaper(bibcode, click=idx == len(new_bibcodes) - 1)
 
         # once we're done, show the results
         # first parse the results into the message shown to the user
@@ -2383,10 +2614,10 @@ class MainWindow(QMainWindow):
         self.rightPanel.populate_tags()
         if not self.rightPanel.abstractText.text().startswith("Click on a paper"):
             self.rightPanel.update_tag_text()
-        # then click this tag
+        # then show the papers with this tag
         for tag in self.tagsList.tags:
             if tag.label.text() == results[4]:
-                tag.mousePressEvent("")
+                tag.showPapers(force=True)
         # finally, unfade everything
         qss_trigger_recursive(self.splitter, "faded", False)
 
@@ -2455,16 +2686,14 @@ class MainWindow(QMainWindow):
         :return: True if an update is available, False if not.
         :rtype: bool
         """
-        # first make sure we're in the working directory where the git repo is
-        original_dir = os.getcwd()
-        os.chdir(Path(__file__).parent.parent)
+        # run these in the directory where the git repo is. This is run in a separate
+        # thread, so we can't change the working directory of the whole application
+        repo_dir = Path(__file__).parent.parent
         # do a get fetch, then see if there are available updates
-        subprocess.run(["git", "fetch"], capture_output=True)
+        subprocess.run(["git", "fetch"], capture_output=True, cwd=repo_dir)
         status = subprocess.run(
-            ["git", "status", "origin", "-uno"], capture_output=True
+            ["git", "status", "origin", "-uno"], capture_output=True, cwd=repo_dir
         ).stdout.decode()  # turn bytestring into regular string
-        # reset the working directory
-        os.chdir(original_dir)
         # then figure out if we need an update
         if "your branch is behind" in status.lower():
             return True
@@ -2473,7 +2702,7 @@ class MainWindow(QMainWindow):
 
 def get_fonts(directory, current_list):
     """
-    Recursive function to get all the fonts within a directory, including all subdirs
+    Get all the fonts within a directory, including all subdirs
 
     Note that all fonts must have the `.ttf` file extension.
 
@@ -2485,26 +2714,60 @@ def get_fonts(directory, current_list):
     :type current_list: list
     :return: None
     """
-    # go through everything in this directory
-    for item in directory.iterdir():
-        # if it's a directory, recursively call this function on that directory.
-        if item.is_dir():
-            get_fonts(item, current_list)
-            # current_list will be modified in place, so we don't need to keep
-            # the returned value
-        # otherwise look for ttf files.
-        if str(item).endswith(".ttf"):
-            current_list.append(str(item))
-
-
-def set_up_fonts():
+    # Walk through all the subdirectories with a stack rather than recursion. scandir
+    # gets the type of each item along with its name, so we don't need to check
+    # each item separately
+    directories = [directory]
+    while len(directories) > 0:
+        with os.scandir(directories.pop()) as items:
+            for item in items:
+                if item.is_dir(follow_symlinks=False):
+                    directories.append(item.path)
+                elif item.name.endswith(".ttf"):
+                    current_list.append(item.path)
+
+
+# The IDs of the fonts that have been added to the Qt font database. These stay
+# registered for the life of the application, so this is used to only add them once.
+_application_font_ids = []
+
+
+def read_fonts():
     """
-    Add all the found fonts to the Qt font database
+    Read the contents of all the font files used by the interface
 
-    :return: None, but the fonts are added to the Qt font database
+    This does not use the Qt font database, so unlike set_up_fonts it can be done in
+    another thread, while other things are being set up. The contents are put into
+    the QByteArray that Qt needs here, so that copy is done in that thread too.
+
+    :return: The contents of each font file
+    :rtype: list[QByteArray]
     """
     # we need to initialize this list to start, as fonts found will be appended to this
     fonts = []
     get_fonts(Path(__file__).parent / "resources" / "fonts", fonts)
-    for font in fonts:
-        QFontDatabase.addApplicationFont(font)
+    return [QByteArray(Path(font).read_bytes()) for font in fonts]
+
+
+def set_up_fonts(font_data=None):
+    """
+    Add all the found fonts to the Qt font database
+
+    This must be done in the main thread, as the Qt font database is not thread safe.
+
+    :param font_data: The contents of each font file, from read_fonts. If this is not
+                      passed, the font files will be read here.
+    :type font_data: list[QByteArray]
+    :return: None, but the fonts are added to the Qt font database
+    """
+    # If the fonts have already been added, Qt would parse and validate every file
+    # again just to register duplicates, so don't bother
+    if len(_application_font_ids) > 0:
+        return
+    if font_data is None:
+        font_data = read_fonts()
+    for data in font_data:
+        font_id = QFontDatabase.addApplicationFontFromData(data)
+        # Qt returns -1 if the font couldn't be loaded
+        if font_id != -1:
+            _application_font_ids.append(font_id)
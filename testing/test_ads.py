@@ -64,6 +64,16 @@ def test_get_correct_bibcode_from_ads_url_with_and_symbol():
     assert ads_call.get_bibcode(u.krumholz.url) == u.krumholz.bibcode
 
 
+def test_bibcode_from_ads_url_ignores_query_string():
+    url = f"https://ui.adsabs.harvard.edu/abs/{u.mine.bibcode}?utm_source=x#abstract"
+    assert ADSWrapper.bibcode_from_ads_url(url) == u.mine.bibcode
+
+
+def test_bibcode_from_ads_url_decodes_url():
+    url = "https://ui.adsabs.harvard.edu/abs/2014prpl.conf%2E%2E243K/abstract"
+    assert ADSWrapper.bibcode_from_ads_url(url) == "2014prpl.conf..243K"
+
+
 def test_get_correct_bibcode_from_oldstyle_ads_url():
     url = f"http://adsabs.harvard.edu/abs/{u.mine.bibcode}"
     assert ads_call.get_bibcode(url) == u.mine.bibcode
@@ -5,6 +5,7 @@ import shutil
 import requests
 import sqlite3
 import contextlib
+import threading
 
 import pytest
 
@@ -29,6 +30,7 @@ punctuation_tags = [
     ":",
 ]
 
+
 # ======================================================================================
 #
 # Fixtures to use as temporary database
@@ -116,9 +118,16 @@ def create_bibtex(*args):
 # basic validation of databases
 #
 # ======================================================================================
-def test_database_has_one_table(db):
+def test_database_has_three_tables(db):
     tables = db._execute("SELECT name FROM sqlite_master WHERE type='table';")
-    assert len(tables) == 1
+    assert len(tables) == 3
+
+
+def test_database_has_tags_tables(db):
+    tables = db._execute("SELECT name FROM sqlite_master WHERE type='table';")
+    names = [item["name"] for item in tables]
+    assert "tags" in names
+    assert "paper_tags" in names
 
 
 def test_database_has_papers_table(db):
@@ -127,11 +136,24 @@ def test_database_has_papers_table(db):
     assert "papers" in names
 
 
+def test_transaction_rolls_back_on_error(db):
+    with pytest.raises(RuntimeError):
+        with db._transaction():
+            db._execute("DELETE FROM papers WHERE bibcode=?", (u.mine.bibcode,))
+            raise RuntimeError
+    assert db.num_papers() == 2
+
+
 # ======================================================================================
 #
 # test adding papers and getting attributes
 #
 # ======================================================================================
+def test_paper_exists(db):
+    assert db.paper_exists(u.mine.bibcode) is True
+    assert db.paper_exists(u.bbfh.bibcode) is False
+
+
 def test_num_papers_is_correct_as_papers_are_added(db_empty):
     assert db_empty.num_papers() == 0
     db_empty.add_paper(u.mine.bibcode)
@@ -460,6 +482,32 @@ def test_get_correct_attributes_bibtex(db):
     assert db.get_paper_attribute(u.tremonti.bibcode, "bibtex") == u.tremonti.bibtex
 
 
+def test_get_paper_attributes_matches_individual_attributes(db):
+    attributes = ["title", "authors", "page", "bibtex", "local_file"]
+    results = db.get_paper_attributes(u.mine.bibcode, attributes)
+    assert list(results.keys()) == attributes
+    for attribute in attributes:
+        assert results[attribute] == db.get_paper_attribute(u.mine.bibcode, attribute)
+
+
+def test_get_paper_attributes_raises_error_if_attribute_does_not_exist(db):
+    with pytest.raises(ValueError):
+        db.get_paper_attributes(u.mine.bibcode, ["title", "bad attribute"])
+
+
+def test_get_all_paper_attributes_matches_individual_attributes(db):
+    attributes = ["title", "authors", "pubdate", "page", "bibtex"]
+    results = db.get_all_paper_attributes(attributes)
+    assert set(results.keys()) == {u.mine.bibcode, u.tremonti.bibcode}
+    for bibcode in results:
+        assert results[bibcode] == db.get_paper_attributes(bibcode, attributes)
+
+
+def test_get_all_paper_attributes_raises_error_if_attribute_does_not_exist(db):
+    with pytest.raises(ValueError):
+        db.get_all_paper_attributes(["title", "bad attribute"])
+
+
 def test_accents_kept_in_author_list(db_empty):
     db_empty.add_paper(u.juan.url)
     assert db_empty.get_paper_attribute(u.juan.bibcode, "authors") == u.juan.authors
@@ -535,6 +583,14 @@ def test_cite_string_many_authors_uses_et_al(db):
     assert db.get_cite_string(u.tremonti.bibcode) == true_cite_string
 
 
+def test_cite_string_updated_after_changing_attribute(db):
+    # the cite string is cached, so make sure it changes when the paper does
+    db.get_cite_string(u.mine.bibcode)
+    db.set_paper_attribute(u.mine.bibcode, "authors", ["Brown, Gillen"])
+    true_cite_string = f"Brown, 2018, ApJ, {u.mine.volume}, {u.mine.page}"
+    assert db.get_cite_string(u.mine.bibcode) == true_cite_string
+
+
 def test_cite_string_apj_is_shortened(db):
     true_cite_string = f"Brown, Gnedin, Li, 2018, ApJ, {u.mine.volume}, {u.mine.page}"
     assert db.get_cite_string(u.mine.bibcode) == true_cite_string
@@ -602,6 +658,25 @@ def test_cite_string_no_page_no_arxiv(db):
     assert db.get_cite_string(u.grasha_thesis.bibcode) == true_cite_string
 
 
+def test_get_all_titles_and_cite_strings_matches_individual_papers(db):
+    # include papers with a nonnumeric page and unpublished papers
+    db.add_paper(u.marks.bibcode)
+    db.add_paper(u.forbes.bibcode)
+    db.add_paper(u.grasha_thesis.bibcode)
+    results = db.get_all_titles_and_cite_strings()
+    assert sorted(results.keys()) == sorted(db.get_all_bibcodes())
+    for bibcode, (title, cite_string) in results.items():
+        assert title == db.get_paper_attribute(bibcode, "title")
+        assert cite_string == db._get_cite_string_uncached(bibcode)
+
+
+def test_get_all_titles_and_cite_strings_fills_cite_string_cache(db):
+    db.get_all_titles_and_cite_strings()
+    assert db._cite_cache[u.mine.bibcode] == db._get_cite_string_uncached(
+        u.mine.bibcode
+    )
+
+
 # =====================================================
 # modifying cite string to save paper pdfs in interface
 # =====================================================
@@ -835,12 +910,41 @@ def test_get_all_tags_on_a_paper_is_sorted_ignoring_case(db):
     assert db.get_paper_tags(u.mine.bibcode) == sorted(tags, key=lambda x: x.lower())
 
 
+def test_get_papers_with_tag_is_correct(db):
+    db.add_new_tag("test_tag")
+    db.add_new_tag("other")
+    db.tag_paper(u.mine.bibcode, "test_tag")
+    db.tag_paper(u.mine.bibcode, "other")
+    db.tag_paper(u.tremonti.bibcode, "other")
+    assert db.get_papers_with_tag("test_tag") == {u.mine.bibcode}
+    assert db.get_papers_with_tag("other") == {u.mine.bibcode, u.tremonti.bibcode}
+
+
+def test_get_papers_with_tag_raises_error_if_tag_not_in_db(db):
+    with pytest.raises(ValueError):
+        db.get_papers_with_tag("nonexistent")
+
+
+def test_get_tags_with_prefix_does_not_use_wildcards(db):
+    for t in ["a_b 1", "axb 2", "a%b 3", "ab 4", "A_B 5"]:
+        db.add_new_tag(t)
+    assert db._get_tags_with_prefix("a_b") == ["a_b 1"]
+    assert db._get_tags_with_prefix("a%b") == ["a%b 3"]
+    assert db._get_tags_with_prefix("a") == ["a%b 3", "a_b 1", "ab 4", "axb 2"]
+
+
 def test_papers_unread_when_added(db_empty):
     db_empty.add_new_tag("Unread")
     db_empty.add_paper(u.mine.bibcode)
     assert db_empty.get_paper_tags(u.mine.bibcode) == ["Unread"]
 
 
+def test_papers_not_unread_when_added_if_asked(db_empty):
+    db_empty.add_new_tag("Unread")
+    db_empty.add_paper(u.mine.bibcode, tag_unread=False)
+    assert db_empty.get_paper_tags(u.mine.bibcode) == []
+
+
 @pytest.mark.parametrize("tag", ["unread", "Unread", "UNREAD", "UnReAd"])
 def test_papers_unread_when_added_capitalization(db_empty, tag):
     db_empty.add_new_tag(tag)
@@ -851,8 +955,8 @@ def test_papers_unread_when_added_capitalization(db_empty, tag):
 # =============
 # deleting tags
 # =============
-# I put this in a separate section since there's a lot of testing here, since I use
-# the method of completely remaking the table just to delete one column. So I want to
+# I put this in a separate section since there's a lot of testing here. Tags used to
+# be deleted by completely remaking the table just to delete one column, so I want to
 # make sure nothing else gets messed up
 def test_delete_tag_removed_from_db(db):
     db.add_new_tag("test_tag")
@@ -1017,6 +1121,13 @@ def test_delete_paper_removes_correct_one(db):
         db.get_paper_attribute(u.mine.bibcode, "title")
 
 
+def test_delete_paper_removes_its_tags(db):
+    db.add_new_tag("test")
+    db.tag_paper(u.mine.bibcode, "test")
+    db.delete_paper(u.mine.bibcode)
+    assert db.get_paper_tags(u.mine.bibcode) == []
+
+
 # ======================================================================================
 #
 # export papers of a given tag
@@ -1244,6 +1355,58 @@ def test_update_system_does_not_change_notes(db_update):
     assert db_update.get_paper_attribute(u.mine_recent.bibcode, "user_notes") == None
 
 
+def test_update_keeps_published_paper_already_in_library(db):
+    # put the arXiv version of my paper in the library too, with its own user data
+    arxiv_bibcode = "2018arXiv180409819B"
+    db._execute(
+        "INSERT INTO papers(bibcode, arxiv_id, citation_keyword, user_notes, "
+        "local_file) VALUES(?, ?, ?, ?, ?)",
+        (arxiv_bibcode, u.mine.arxiv_id, "arxiv_key", "arXiv notes", "/arxiv.pdf"),
+    )
+    db.add_new_tag("arXiv tag")
+    db.tag_paper(arxiv_bibcode, "arXiv tag")
+    # and give the published paper its own user data
+    db.set_paper_attribute(u.mine.bibcode, "user_notes", "Published notes")
+    db.set_paper_attribute(u.mine.bibcode, "local_file", "/published.pdf")
+    db.set_paper_attribute(u.mine.bibcode, "citation_keyword", "published_key")
+    db.add_new_tag("Unread")
+
+    db.update_paper(arxiv_bibcode)
+    assert sorted(db.get_all_bibcodes()) == sorted([u.mine.bibcode, u.tremonti.bibcode])
+    assert db.get_paper_attribute(u.mine.bibcode, "user_notes") == "Published notes"
+    assert db.get_paper_attribute(u.mine.bibcode, "local_file") == "/published.pdf"
+    assert db.get_paper_attribute(u.mine.bibcode, "citation_keyword") == "published_key"
+    # the tags of the arXiv version are kept, but this isn't a new paper, so it's
+    # not marked unread
+    assert db.get_paper_tags(u.mine.bibcode) == ["arXiv tag"]
+
+
+def test_update_keeps_published_paper_without_upsert(db, monkeypatch):
+    # older versions of sqlite don't support ON CONFLICT, so check we don't need it
+    original_execute = Database._execute
+
+    def old_sqlite_execute(self, sql, parameters=()):
+        if "ON CONFLICT" in sql:
+            raise sqlite3.OperationalError('near "ON": syntax error')
+        return original_execute(self, sql, parameters)
+
+    monkeypatch.setattr(Database, "_execute", old_sqlite_execute)
+    arxiv_bibcode = "2018arXiv180409819B"
+    db._execute(
+        "INSERT INTO papers(bibcode, arxiv_id, citation_keyword) VALUES(?, ?, ?)",
+        (arxiv_bibcode, u.mine.arxiv_id, "arxiv_key"),
+    )
+    db.set_paper_attribute(u.mine.bibcode, "user_notes", "Published notes")
+    db.set_paper_attribute(u.mine.bibcode, "local_file", "/published.pdf")
+    db.set_paper_attribute(u.mine.bibcode, "citation_keyword", "published_key")
+
+    db.update_paper(arxiv_bibcode)
+    assert arxiv_bibcode not in db.get_all_bibcodes()
+    assert db.get_paper_attribute(u.mine.bibcode, "user_notes") == "Published notes"
+    assert db.get_paper_attribute(u.mine.bibcode, "local_file") == "/published.pdf"
+    assert db.get_paper_attribute(u.mine.bibcode, "citation_keyword") == "published_key"
+
+
 def test_update_system_does_not_update_published_papers(db_update):
     assert (
         db_update.get_paper_attribute(u.tremonti.bibcode, "bibtex") == u.tremonti.bibtex
@@ -1251,6 +1414,63 @@ def test_update_system_does_not_update_published_papers(db_update):
     assert db_update.get_paper_attribute(u.forbes.bibcode, "bibtex") == u.forbes.bibtex
 
 
+def test_update_system_removes_tag_columns(db_update):
+    columns = [c["name"] for c in db_update._execute("PRAGMA table_info(papers)")]
+    assert sorted(columns) == sorted(Database.colnames_data)
+
+
+def test_rebuild_papers_table_removes_tag_columns(db):
+    # this is the path used on older versions of sqlite without DROP COLUMN
+    db._execute("ALTER TABLE papers ADD COLUMN tag_test INTEGER NOT NULL DEFAULT 0")
+    db._rebuild_papers_table()
+    columns = [c["name"] for c in db._execute("PRAGMA table_info(papers)")]
+    assert sorted(columns) == sorted(Database.colnames_data)
+    assert db.get_paper_attribute(u.mine.bibcode, "title") == u.mine.title
+
+
+def test_update_system_rebuild_path_keeps_tags_and_papers(monkeypatch):
+    # this is the path used on older versions of sqlite without DROP COLUMN. We open
+    # the old database with DROP COLUMN failing, as it would there
+    original_execute = Database._execute
+
+    def old_sqlite_execute(self, sql, parameters=()):
+        if "DROP COLUMN" in sql:
+            raise sqlite3.OperationalError('near "DROP": syntax error')
+        return original_execute(self, sql, parameters)
+
+    monkeypatch.setattr(Database, "_execute", old_sqlite_execute)
+    # don't update the papers from ADS, since we only want to check the conversion
+    monkeypatch.setattr(Database, "update_paper", lambda _, b: None)
+    file_path = Path(f"{random.randint(0, 1000000000)}.db")
+    shutil.copy2(Path(__file__).parent / "testing_update.db", file_path)
+    db = Database(file_path)
+    try:
+        columns = [c["name"] for c in db._execute("PRAGMA table_info(papers)")]
+        assert sorted(columns) == sorted(Database.colnames_data)
+        # the papers haven't been updated, so they still have their old bibcodes
+        old_mine_bibcode = "2018arXiv180409819B"
+        assert len(db.get_all_bibcodes()) == 5
+        assert db.get_paper_attribute(old_mine_bibcode, "user_notes") == (
+            "Test notes are here!"
+        )
+        assert sorted(db.get_all_tags()) == ["Read", "Unread", "test"]
+        assert db.get_paper_tags(old_mine_bibcode) == ["test", "Unread"]
+        assert db.get_paper_tags(u.tremonti.bibcode) == ["Unread"]
+    finally:
+        file_path.unlink()
+
+
+def test_update_system_converts_authors_of_published_papers(db_update):
+    # these papers aren't updated from ADS, so the authors must come from converting
+    # the old separator format
+    for p in [u.tremonti, u.forbes]:
+        assert db_update.get_paper_attribute(p.bibcode, "authors") == p.authors
+        raw = db_update._execute(
+            "SELECT authors FROM papers WHERE bibcode=?", (p.bibcode,)
+        )[0]["authors"]
+        assert raw.startswith("[")
+
+
 def test_update_system_does_not_run_soon_after_last_check(db_update, monkeypatch):
     # the update system runs automatically on creation. We'll make a new database
     # using the same file, but monkeypatch the update system to check what papers
@@ -1360,6 +1580,48 @@ def test_import_single_good_paper_with_adsurl_adds_to_database(db_empty):
     assert db_empty.get_all_bibcodes() == [u.mine.bibcode]
 
 
+def test_import_duplicate_with_adsurl_does_not_query_ads(db_empty, monkeypatch):
+    db_empty.add_paper(u.mine.bibcode)
+    calls = []
+    original_get_info = ads_call.get_info
+
+    def func(bibcode):
+        calls.append(bibcode)
+        return original_get_info(bibcode)
+
+    monkeypatch.setattr(ads_call, "get_info", func)
+    file_loc = create_bibtex(u.mine.bibtex)
+    results = db_empty.import_bibtex(file_loc)
+    file_loc.unlink()  # delete before tests may fail
+    assert results[1] == 1
+    assert calls == []
+
+
+def test_import_duplicate_arxiv_paper_does_not_query_ads(db_empty, monkeypatch):
+    # an arXiv paper that hasn't been updated to the published version. Checking
+    # whether it's been published would need ADS, which we don't want during imports
+    arxiv_bibcode = "2018arXiv180409819B"
+    db_empty._execute(
+        "INSERT INTO papers(bibcode, arxiv_id, citation_keyword) VALUES(?, ?, ?)",
+        (arxiv_bibcode, u.mine.arxiv_id, arxiv_bibcode),
+    )
+    queries = []
+
+    def search_query(**kwargs):
+        queries.append(kwargs)
+        return []
+
+    monkeypatch.setattr(ads_call, "search_query", search_query)
+    bibtex = u.mine.bibtex.replace("abs/2018ApJ...864...94B", f"abs/{arxiv_bibcode}")
+    file_loc = create_bibtex(bibtex)
+    results = db_empty.import_bibtex(file_loc)
+    file_loc.unlink()  # delete before tests may fail
+    assert queries == []
+    assert results[1] == 1
+    assert db_empty.get_all_bibcodes() == [arxiv_bibcode]
+    assert db_empty.get_paper_tags(arxiv_bibcode) == [results[4]]
+
+
 def test_import_single_good_paper_with_doi_adds_to_database(db_empty):
     bibtex = u.mine.bibtex
     for to_replace in [
@@ -1620,6 +1882,18 @@ def test_import_created_tags_work_correctly_beyond_10(db_empty):
     )
 
 
+def test_import_created_tags_ignore_other_tags_with_same_start(db_empty):
+    file_loc = create_bibtex(u.mine.bibtex)
+    db_empty.add_new_tag(f"Import {file_loc.name} notes")
+    db_empty.import_bibtex(file_loc)
+    db_empty.import_bibtex(file_loc)
+    file_loc.unlink()  # delete before tests may fail
+    assert sorted(db_empty.get_paper_tags(u.mine.bibcode)) == [
+        f"Import {file_loc.name}",
+        f"Import {file_loc.name} 2",
+    ]
+
+
 def test_import_return_tuple_tag_name(db_empty):
     file_loc = create_bibtex(u.mine.bibtex, u.tremonti.bibtex)
     results = db_empty.import_bibtex(file_loc)
@@ -1799,6 +2073,80 @@ def test_import_failure_file_contains_reason_out_of_queries(db_empty, monkeypatc
     )
 
 
+def test_import_repeated_entries_only_looked_up_once(db_empty, monkeypatch):
+    calls = []
+
+    def func(**kwargs):
+        calls.append(kwargs)
+        raise ValueError("couldn't find paper with an exact match to this info on ADS")
+
+    monkeypatch.setattr(ads_call, "get_bibcode_from_journal", func)
+    bad = "@ARTICLE{test,\n   year = 1959,\n}"
+    file_loc = create_bibtex(bad, bad.replace("{test", "{test2"))
+    results = db_empty.import_bibtex(file_loc)
+    file_loc.unlink()  # delete before tests may fail
+    results[3].unlink()
+    assert results[2] == 2
+    assert len(calls) == 1
+
+
+def test_import_journal_entries_all_see_complete_bibstems(db_empty, monkeypatch):
+    # start without the bibstems, and make building them slow, so that the other
+    # lookups in the import try to use them while they're being built
+    monkeypatch.setattr(ads_call, "bibstems", dict())
+    original_build = ads_call._build_bibstems
+
+    def slow_build():
+        ads_call.bibstems["placeholder"] = "placeholder"
+        time.sleep(0.2)
+        original_build()
+
+    monkeypatch.setattr(ads_call, "_build_bibstems", slow_build)
+    queries = []
+
+    def search_query(**kwargs):
+        queries.append(kwargs["q"])
+        return []
+
+    monkeypatch.setattr(ads_call, "search_query", search_query)
+    # two entries with only the journal info, so both are looked up that way
+    entry = "@ARTICLE{test,\n   journal = {\\apj},\n   volume = 864,\n}"
+    file_loc = create_bibtex(entry, entry.replace("{test", "{test2").replace("4", "5"))
+    results = db_empty.import_bibtex(file_loc)
+    file_loc.unlink()  # delete before tests may fail
+    results[3].unlink()
+    assert len(queries) == 2
+    for query in queries:
+        assert 'bibstem:"ApJ"' in query
+
+
+def test_import_lookups_only_use_database_from_main_thread(db_empty, monkeypatch):
+    threads = []
+    original_execute = db_empty._execute_with_factory
+
+    def execute(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return original_execute(*args, **kwargs)
+
+    monkeypatch.setattr(db_empty, "_execute_with_factory", execute)
+    # find the paper, but have getting its details fail, so ADS is not needed
+    monkeypatch.setattr(
+        ads_call, "get_bibcode_from_journal", lambda **kwargs: u.mine.bibcode
+    )
+
+    def get_info(bibcode):
+        raise ValueError("test")
+
+    monkeypatch.setattr(ads_call, "get_info", get_info)
+    entry = "@ARTICLE{test,\n   year = 2018,\n}"
+    file_loc = create_bibtex(entry, entry.replace("2018", "2019"))
+    results = db_empty.import_bibtex(file_loc)
+    file_loc.unlink()  # delete before tests may fail
+    results[3].unlink()
+    assert results[2] == 2
+    assert threads == [threading.main_thread()] * len(threads)
+
+
 def test_import_failure_file_contains_reason_no_internet(db_empty, monkeypatch):
     def func(x, y):
         raise requests.exceptions.ConnectionError("Max retries exceeded with url")
@@ -1887,11 +2235,32 @@ def test_import_citation_keyword_is_bibcode_if_user_gives_duplicate_key(db_empty
 
 
 def test_import_progress_bar_is_updated(db_empty):
-    file_loc = create_bibtex(u.mine.bibtex)
+    file_loc = create_bibtex(u.mine.bibtex, u.tremonti.bibtex)
+    with open(file_loc, "r") as bibfile:
+        n_lines = len(bibfile.readlines())
     update_calls = []
     db_empty.import_bibtex(file_loc, lambda x: update_calls.append(x))
     file_loc.unlink()  # delete before tests may fail
-    assert update_calls == list(range(1, 20))
+    # this is updated after each entry with the number of lines read so far
+    assert update_calls == [u.mine.bibtex.count("\n") + 2, n_lines]
+
+
+def test_import_tags_not_stale_after_read_from_other_thread(db_empty, monkeypatch):
+    # While the import is being written, the interface may read the tags from its own
+    # thread, which can't see the new import tag yet. This shouldn't stay cached.
+    original_execute_many = Database._execute_many
+
+    def execute_many_then_read(self, sql, parameters_list):
+        original_execute_many(self, sql, parameters_list)
+        reader = threading.Thread(target=self.get_all_tags)
+        reader.start()
+        reader.join()
+
+    monkeypatch.setattr(Database, "_execute_many", execute_many_then_read)
+    file_loc = create_bibtex("% only a comment")
+    new_tag = db_empty.import_bibtex(file_loc)[4]
+    file_loc.unlink()  # delete before tests may fail
+    assert new_tag in db_empty.get_all_tags()
 
 
 # ==============================================
@@ -3,6 +3,7 @@ test_interface.py
 
 Perform tests on the GUI using pytest-qt
 """
+
 import os
 import sys
 from pathlib import Path
@@ -10,6 +11,7 @@ import random
 import requests
 import shutil
 import subprocess
+import threading
 
 # make sure tests do not appear on screen
 os.environ["QT_QPA_PLATFORM"] = "offscreen"
@@ -24,6 +26,7 @@ import ads
 
 from library.interface import MainWindow, get_fonts, set_up_fonts, Paper
 from library.database import Database
+from library import interface, database
 import test_utils as u
 
 
@@ -156,6 +159,20 @@ def cInitialize(qtbot, db):
     return widget
 
 
+def cWaitForUpdateCheck(widget, qtbot):
+    """
+    Wait for the check for updates, which is done in a separate thread, to finish
+
+    :param widget: the main window widget
+    :type widget: MainWindow
+    :param qtbot: the qtbot instance used in a given test
+    :return: None
+    """
+    widget.threadpool.waitForDone()
+    # the result is sent back with a signal, which needs the event loop to run
+    qtbot.wait(10)
+
+
 def cClick(widget, qtbot):
     """
     Click on a given widget
@@ -243,6 +260,23 @@ def cAddPaper(mainWidget, identifier, qtbot):
     """
     cEnterText(mainWidget.searchBar, identifier, qtbot)
     cPressEnter(mainWidget.searchBar, qtbot)
+    cWaitForPaperAdded(mainWidget, qtbot)
+
+
+def cWaitForPaperAdded(mainWidget, qtbot):
+    """
+    Wait for a paper being added, which is done in a separate thread, to finish
+
+    :param mainWidget: The main window widget
+    :type mainWidget: MainWindow
+    :param qtbot: the qtbot instance used in a given test
+    :return: None
+    """
+    # the search bar is disabled until the paper has been added to the interface
+    qtbot.waitUntil(mainWidget.searchBar.isEnabled)
+    # adding the paper also schedules things for the event loop (like scrolling to the
+    # new paper), so let those run too, so tests don't depend on timing
+    qtbot.wait(10)
 
 
 def cAddTag(mainWidget, tagName, qtbot):
@@ -499,6 +533,19 @@ def test_fonts_are_actually_in_the_font_database_after_set_up_fonts(qtbot):
     assert QFontDatabase.hasFamily("Cabin")
 
 
+def test_fonts_are_only_added_to_font_database_once(qtbot, monkeypatch):
+    # qtbot is needed to initialize the application
+    set_up_fonts()
+    # then see if the fonts get added again
+    calls = []
+    monkeypatch.setattr(
+        QFontDatabase, "addApplicationFontFromData", lambda data: calls.append(data)
+    )
+    set_up_fonts()
+    assert calls == []
+    assert QFontDatabase.hasFamily("Lobster")
+
+
 def test_window_initial_width(qtbot, db_empty):
     widget = cInitialize(qtbot, db_empty)
     assert widget.size().width() == 1100
@@ -538,8 +585,9 @@ def test_import_notification_normally_disabled(qtbot, db, monkeypatch):
             b"\n\nnothing to commit (use -u to show untracked files)"
         )
 
-    monkeypatch.setattr(subprocess, "run", lambda cmd, capture_output: dummy())
+    monkeypatch.setattr(subprocess, "run", lambda cmd, capture_output, cwd: dummy())
     widget = cInitialize(qtbot, db)
+    cWaitForUpdateCheck(widget, qtbot)
     assert widget.updateText.isHidden() is True
 
 
@@ -553,8 +601,9 @@ def test_import_notification_shown_when_needed(qtbot, db, monkeypatch):
             b"nothing to commit (use -u to show untracked files)"
         )
 
-    monkeypatch.setattr(subprocess, "run", lambda cmd, capture_output: dummy())
+    monkeypatch.setattr(subprocess, "run", lambda cmd, capture_output, cwd: dummy())
     widget = cInitialize(qtbot, db)
+    cWaitForUpdateCheck(widget, qtbot)
     assert widget.updateText.isHidden() is False
 
 
@@ -568,8 +617,10 @@ def test_import_notification_text(qtbot, db, monkeypatch):
             b"nothing to commit (use -u to show untracked files)"
         )
 
-    monkeypatch.setattr(subprocess, "run", lambda cmd, capture_output: dummy())
+    monkeypatch.setattr(subprocess, "run", lambda cmd, capture_output, cwd: dummy())
     widget = cInitialize(qtbot, db)
+    cWaitForUpdateCheck(widget, qtbot)
+    assert widget.updateText.isHidden() is False
     assert widget.updateText.text().startswith(
         "An update is available! To update, navigate to "
     )
@@ -588,8 +639,10 @@ def test_import_notification_text_path(qtbot, db, monkeypatch):
             b"nothing to commit (use -u to show untracked files)"
         )
 
-    monkeypatch.setattr(subprocess, "run", lambda cmd, capture_output: dummy())
+    monkeypatch.setattr(subprocess, "run", lambda cmd, capture_output, cwd: dummy())
     widget = cInitialize(qtbot, db)
+    cWaitForUpdateCheck(widget, qtbot)
+    assert widget.updateText.isHidden() is False
     shown_path = widget.updateText.text().split()[8]
     # ~ isn't part of Windows, so we need to be careful about how we check
     if sys.platform != "win32":
@@ -606,16 +659,34 @@ def test_import_notification_disabled_if_no_internet(qtbot, db, monkeypatch):
         )
         stdout = b"dummy"
 
-    monkeypatch.setattr(subprocess, "run", lambda cmd, capture_output: dummy())
+    monkeypatch.setattr(subprocess, "run", lambda cmd, capture_output, cwd: dummy())
     widget = cInitialize(qtbot, db)
+    cWaitForUpdateCheck(widget, qtbot)
     assert widget.updateText.isHidden() is True
 
 
 def test_import_notification_run_from_right_directory(qtbot, db, monkeypatch):
+    class dummy(object):
+        stdout = b"dummy"
+
+    cwds = []
+
+    def dummy_run(cmd, capture_output, cwd):
+        cwds.append(cwd)
+        return dummy()
+
+    monkeypatch.setattr(subprocess, "run", dummy_run)
+    widget = cInitialize(qtbot, db)
+    cWaitForUpdateCheck(widget, qtbot)
+    assert cwds == [Path(__file__).parent.parent] * 2
+
+
+def test_import_notification_does_not_change_directory(qtbot, db, monkeypatch):
     chdir_calls = []
     monkeypatch.setattr(os, "chdir", lambda x: chdir_calls.append(x))
     widget = cInitialize(qtbot, db)
-    assert chdir_calls == [Path(__file__).parent.parent, os.getcwd()]
+    cWaitForUpdateCheck(widget, qtbot)
+    assert chdir_calls == []
 
 
 # ==========================
@@ -630,6 +701,22 @@ def test_widgets_are_sized_appropriately_at_beginning(qtbot, db_temp):
     assert o_sizes[0] < o_sizes[2] < o_sizes[1]
 
 
+def test_papers_not_resized_when_only_height_changes(qtbot, db_temp, monkeypatch):
+    widget = cInitialize(qtbot, db_temp)
+    resize_calls = []
+    monkeypatch.setattr(
+        widget.papersList,
+        "resize_items_in_layout",
+        lambda layout, width: resize_calls.append(width),
+    )
+    widget.resize(widget.width(), widget.height() + 100)
+    qtbot.wait(10)
+    assert resize_calls == []
+    widget.resize(widget.width() + 100, widget.height())
+    qtbot.wait(10)
+    assert len(resize_calls) == 1
+
+
 def test_widgets_dont_go_outside_of_splitter(qtbot, db_temp):
     widget = cInitialize(qtbot, db_temp)
     cClick(widget.papersList.getPapers()[0], qtbot)
@@ -1109,6 +1196,7 @@ def test_can_add_paper_by_filling_bibcode_then_clicking_button(qtbot, db_empty):
     widget = cInitialize(qtbot, db_empty)
     cEnterText(widget.searchBar, u.mine.bibcode, qtbot)
     cClick(widget.addButton, qtbot)
+    cWaitForPaperAdded(widget, qtbot)
     assert len(db_empty.get_all_bibcodes()) == 1
     assert u.mine.bibcode in db_empty.get_all_bibcodes()
 
@@ -1118,10 +1206,59 @@ def test_can_add_paper_by_filling_bibcode_then_pressing_enter(qtbot, db_empty):
     widget = cInitialize(qtbot, db_empty)
     cEnterText(widget.searchBar, u.mine.bibcode, qtbot)
     cPressEnter(widget.searchBar, qtbot)
+    cWaitForPaperAdded(widget, qtbot)
     assert len(db_empty.get_all_bibcodes()) == 1
     assert u.mine.bibcode in db_empty.get_all_bibcodes()
 
 
+def test_adding_paper_reenables_search_bar_and_button(qtbot, db_empty):
+    widget = cInitialize(qtbot, db_empty)
+    cAddPaper(widget, u.mine.bibcode, qtbot)
+    assert widget.searchBar.isEnabled() is True
+    assert widget.addButton.isEnabled() is True
+
+
+def test_adding_paper_reenables_import_button(qtbot, db_empty):
+    widget = cInitialize(qtbot, db_empty)
+    cAddPaper(widget, u.mine.bibcode, qtbot)
+    assert widget.importButton.isEnabled() is True
+
+
+def test_cannot_import_while_adding_paper(qtbot, db_empty, monkeypatch):
+    widget = cInitialize(qtbot, db_empty)
+    # make adding the paper wait until we've tried to start an import
+    original_add = widget.addPaperToDatabase
+    tried_import = threading.Event()
+
+    def slow_add(identifier):
+        tried_import.wait(5)
+        return original_add(identifier)
+
+    monkeypatch.setattr(widget, "addPaperToDatabase", slow_add)
+    dialogs = []
+
+    def mock_get_file(*args, **kwargs):
+        dialogs.append(kwargs)
+        return "", ""
+
+    monkeypatch.setattr(QFileDialog, "getOpenFileName", mock_get_file)
+    cEnterText(widget.searchBar, u.mine.bibcode, qtbot)
+    cPressEnter(widget.searchBar, qtbot)
+    assert widget.importButton.isEnabled() is False
+    cClick(widget.importButton, qtbot)
+    tried_import.set()
+    cWaitForPaperAdded(widget, qtbot)
+    assert dialogs == []
+    assert [p.bibcode for p in widget.papersList.getPapers()] == [u.mine.bibcode]
+
+
+def test_adding_paper_in_thread_returns_errors(qtbot, db_empty):
+    widget = cInitialize(qtbot, db_empty)
+    bibcode, error = widget.addPaperToDatabase("not a real identifier")
+    assert bibcode is None
+    assert isinstance(error, ValueError)
+
+
 def test_adding_paper_adds_paper_to_interface(qtbot, db_empty):
     widget = cInitialize(qtbot, db_empty)
     assert len(widget.papersList.getPapers()) == 0
@@ -1224,7 +1361,8 @@ def test_adding_paper_scrolls_to_show_paper(qtbot, db_empty, monkeypatch):
     cAddPaper(widget, u.mine_recent.bibcode, qtbot)
     # scroll = widget.papersList.verticalScrollBar()
     # assert scroll.value() > 0
-    assert calls == [1]
+    # It's called once directly, then again once the event loop runs
+    assert calls == [1, 1]
 
 
 def test_adding_paper_includes_tag_selected_in_left_panel(qtbot, db_empty):
@@ -1715,6 +1853,30 @@ def test_import_progressbar_has_correct_max_value(qtbot, db_empty, monkeypatch):
     file_loc.unlink()  # delete before tests may fail
 
 
+def test_import_non_ascii_file_does_not_depend_on_locale(qtbot, db_empty, monkeypatch):
+    # BibTeX files are UTF-8, but the default encoding on Windows is cp1252, which
+    # can't decode some characters (like the second byte of "Á" and "ō" in UTF-8).
+    # Files opened without an encoding use cp1252 here, to check we don't rely on it.
+    def cp1252_open(file, mode="r", *args, **kwargs):
+        if "b" not in mode:
+            kwargs.setdefault("encoding", "cp1252")
+        return open(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr(interface, "open", cp1252_open, raising=False)
+    monkeypatch.setattr(database, "open", cp1252_open, raising=False)
+    text = "% Ángel Itō\n" + u.mine.bibtex
+    file_loc = Path(f"{random.randint(0, 1000000000)}.bib").resolve()
+    file_loc.write_text(text, encoding="utf-8")
+    test_func = lambda filter, dir: (str(file_loc), "dummy_filter")
+    monkeypatch.setattr(QFileDialog, "getOpenFileName", test_func)
+    widget = cInitialize(qtbot, db_empty)
+    with qtbot.waitSignal(widget.importWorker.signals.finished, timeout=10000):
+        cClick(widget.importButton, qtbot)
+        assert widget.importProgressBar.maximum() == len(text.splitlines())
+    file_loc.unlink()  # delete before tests may fail
+    assert db_empty.get_all_bibcodes() == [u.mine.bibcode]
+
+
 def test_import_progressbar_ends_at_number_of_lines(qtbot, db_empty, monkeypatch):
     file_loc, test_func = create_bibtex_monkeypatch(u.mine.bibtex)
     monkeypatch.setattr(QFileDialog, "getOpenFileName", test_func)
@@ -2051,6 +2213,23 @@ def test_import_imported_papers_are_shown_in_center(qtbot, db_empty, monkeypatch
     assert seen_papers == [u.tremonti.bibcode, u.mine.bibcode]
 
 
+def test_import_only_shows_one_new_paper_in_right_panel(qtbot, db_empty, monkeypatch):
+    db_empty.add_paper(u.juan.bibcode)
+    file_loc, test_func = create_bibtex_monkeypatch(u.mine.bibtex, u.tremonti.bibtex)
+    monkeypatch.setattr(QFileDialog, "getOpenFileName", test_func)
+    widget = cInitialize(qtbot, db_empty)
+    shown = []
+    monkeypatch.setattr(widget.rightPanel, "setPaperDetails", shown.append)
+    with qtbot.waitSignal(widget.importWorker.signals.finished, timeout=10000):
+        cClick(widget.importButton, qtbot)
+    file_loc.unlink()  # delete before tests may fail
+    assert len(shown) == 1
+    # the papers should still be in order
+    papers = widget.papersList.getPapers()
+    assert len(papers) == 3
+    assert papers == sorted(papers, key=widget.papersList.sortKey)
+
+
 def test_import_new_tag_is_shown_in_right_panel(qtbot, db_empty, monkeypatch):
     db_empty.add_paper(u.mine.bibcode)
     db_empty.add_new_tag("Unread")
@@ -2172,6 +2351,20 @@ def test_right_panel_cite_text_has_word_wrap_on(qtbot, db):
     assert widget.rightPanel.citeText.wordWrap()
 
 
+def test_right_panel_plain_labels_skip_rich_text_detection(qtbot, db):
+    widget = cInitialize(qtbot, db)
+    for label in [
+        widget.rightPanel.citeText,
+        widget.rightPanel.tagText,
+        widget.rightPanel.citeKeyText,
+        widget.rightPanel.pdfText,
+    ]:
+        assert label.textFormat() == Qt.PlainText
+    # titles and abstracts can have sub/superscripts, so those are detected
+    assert widget.rightPanel.titleText.textFormat() == Qt.AutoText
+    assert widget.rightPanel.abstractText.textFormat() == Qt.AutoText
+
+
 def test_right_panel_abstract_text_has_word_wrap_on(qtbot, db):
     widget = cInitialize(qtbot, db)
     assert widget.rightPanel.abstractText.wordWrap()
@@ -2628,6 +2821,24 @@ def test_paper_pdf_add_local_file_asks_user(qtbot, db_temp, monkeypatch):
     assert get_file_calls == [1]
 
 
+def test_paper_pdf_add_local_file_starts_in_last_directory(qtbot, db_temp, monkeypatch):
+    # record the directories the user was shown
+    dir_suggestions = []
+    test_loc = Path(__file__).resolve()
+
+    def mock_get_file(filter="", dir=""):
+        dir_suggestions.append(dir)
+        return str(test_loc), "dummy filter"
+
+    monkeypatch.setattr(QFileDialog, "getOpenFileName", mock_get_file)
+    widget = cInitialize(qtbot, db_temp)
+    for paper in widget.papersList.getPapers():
+        cClick(paper, qtbot)
+        cClick(widget.rightPanel.pdfChooseLocalFileButton, qtbot)
+    # the second paper should start where the first was chosen
+    assert dir_suggestions == [str(Path.home()), str(test_loc.parent)]
+
+
 def test_paper_pdf_add_local_file_doesnt_add_if_cancelled(qtbot, db_temp, monkeypatch):
     monkeypatch.setattr(QFileDialog, "getOpenFileName", mOpenFileNoResponse)
     widget = cInitialize(qtbot, db_temp)
@@ -3099,6 +3310,58 @@ def test_right_panel_tags_checked_match_paper_that_is_selected(qtbot, db):
             assert not tag.isChecked()
 
 
+def test_right_panel_details_read_from_database_at_once(qtbot, db, monkeypatch):
+    widget = cInitialize(qtbot, db)
+
+    # the attributes should all be gotten together, and the tags only once
+    def raise_error(*args, **kwargs):
+        raise AssertionError("should not get each attribute separately")
+
+    monkeypatch.setattr(db, "get_paper_attribute", raise_error)
+    tag_calls = []
+    get_paper_tags = db.get_paper_tags
+    monkeypatch.setattr(
+        db, "get_paper_tags", lambda b: tag_calls.append(b) or get_paper_tags(b)
+    )
+    paper = widget.papersList.getPapers()[0]
+    cClick(paper, qtbot)
+    assert tag_calls == [paper.bibcode]
+
+
+def test_right_panel_tags_checked_without_checking_each_tag(qtbot, db, monkeypatch):
+    widget = cInitialize(qtbot, db)
+
+    # the paper's tags should be gotten all at once, not one tag at a time
+    def raise_error(*args, **kwargs):
+        raise AssertionError("should not check each tag separately")
+
+    monkeypatch.setattr(db, "paper_has_tag", raise_error)
+    paper = widget.papersList.getPapers()[0]
+    cClick(paper, qtbot)
+    paper_tags = db.get_paper_tags(paper.bibcode)
+    for tag in widget.rightPanel.getTagCheckboxes():
+        assert tag.isChecked() == (tag.text() in paper_tags)
+
+
+def test_right_panel_tags_checked_without_changing_database(
+    qtbot, db_temp, monkeypatch
+):
+    db_temp.add_new_tag("test")
+    db_temp.tag_paper(u.mine.bibcode, "test")
+    widget = cInitialize(qtbot, db_temp)
+
+    # showing the papers should not tag or untag them
+    def raise_error(*args, **kwargs):
+        raise AssertionError("should not change tags")
+
+    monkeypatch.setattr(db_temp, "tag_paper", raise_error)
+    monkeypatch.setattr(db_temp, "untag_paper", raise_error)
+    for paper in widget.papersList.getPapers():
+        cClick(paper, qtbot)
+        for tag in widget.rightPanel.getTagCheckboxes():
+            assert tag.isChecked() == db_temp.paper_has_tag(paper.bibcode, tag.text())
+
+
 def test_tags_selection_edit_button_is_hidden_when_pressed(qtbot, db):
     widget = cInitialize(qtbot, db)
     cClick(widget.papersList.getPapers()[0], qtbot)
@@ -4214,6 +4477,14 @@ def test_paper_cite_string_has_word_wrap_on(qtbot, db):
         assert paper.citeText.wordWrap()
 
 
+def test_paper_cite_string_skips_rich_text_detection(qtbot, db):
+    widget = cInitialize(qtbot, db)
+    for paper in widget.papersList.getPapers():
+        assert paper.citeText.textFormat() == Qt.PlainText
+        # titles can have sub/superscripts, so those are detected
+        assert paper.titleText.textFormat() == Qt.AutoText
+
+
 # ===============
 # creating papers
 # ===============
@@ -4330,6 +4601,23 @@ def test_dclicking_on_paper_with_local_file_opens_it(qtbot, db_empty, monkeypatc
     assert open_calls == [f"file:{test_loc}"]
 
 
+def test_dclicking_on_paper_reads_local_file_once(qtbot, db_empty, monkeypatch):
+    monkeypatch.setattr(QDesktopServices, "openUrl", lambda x: None)
+    widget = cInitialize(qtbot, db_empty)
+    cAddPaper(widget, u.mine.bibcode, qtbot)
+    db_empty.set_paper_attribute(u.mine.bibcode, "local_file", __file__)
+    # then keep track of what is read from the database
+    calls = []
+    get_paper_attribute = db_empty.get_paper_attribute
+    monkeypatch.setattr(
+        db_empty,
+        "get_paper_attribute",
+        lambda b, a: calls.append(a) or get_paper_attribute(b, a),
+    )
+    widget.papersList.getPapers()[0].doubleClick()
+    assert calls == ["local_file"]
+
+
 def test_dclicking_on_paper_with_no_local_file_doesnt_ask(qtbot, db_temp, monkeypatch):
     user_asks = []
     monkeypatch.setattr(
@@ -4475,6 +4763,17 @@ def test_papers_are_in_sorted_order_after_adding(qtbot, db_temp):
     assert dates == sorted(dates)
 
 
+def test_papers_are_in_sorted_order_after_adding_sorted_by_author(qtbot, db_temp):
+    widget = cInitialize(qtbot, db_temp)
+    index = widget.papersList.sortChooser.findText("Sort by First Author")
+    widget.papersList.sortChooser.setCurrentIndex(index)
+    for bibcode in [u.mine_recent.bibcode, u.bbfh.bibcode]:
+        cAddPaper(widget, bibcode, qtbot)
+    # then check sorting
+    papers = widget.papersList.getPapers()
+    assert papers == sorted(papers, key=widget.papersList.sortKey)
+
+
 def test_paper_sort_is_initially_by_date(qtbot, db):
     widget = cInitialize(qtbot, db)
     bibcodes = [paper.bibcode for paper in widget.papersList.getPapers()]
@@ -4491,6 +4790,51 @@ def test_paper_sort_dropdown_can_sort_by_author(qtbot, db):
     assert bibcodes == [u.mine.bibcode, u.tremonti.bibcode]
 
 
+def test_paper_text_read_from_database_at_once_on_startup(qtbot, db, monkeypatch):
+    # the papers shouldn't need to get their title or cite string separately
+    def raise_error(*args, **kwargs):
+        raise AssertionError("should not get each paper separately")
+
+    monkeypatch.setattr(db, "get_cite_string", raise_error)
+    widget = cInitialize(qtbot, db)
+    for paper in widget.papersList.getPapers():
+        assert paper.titleText.text() == db.get_paper_attribute(paper.bibcode, "title")
+
+
+def test_paper_sort_keys_only_read_from_database_once(qtbot, db, monkeypatch):
+    widget = cInitialize(qtbot, db)
+    # sort by author then back to date. Both sets of keys are now known
+    for text in ["Sort by First Author", "Sort by Date"]:
+        index = widget.papersList.sortChooser.findText(text)
+        widget.papersList.sortChooser.setCurrentIndex(index)
+
+    # then make the database unusable, and check that sorting still works
+    def raise_error(*args, **kwargs):
+        raise AssertionError("should not use the database")
+
+    monkeypatch.setattr(db, "get_paper_attribute", raise_error)
+    monkeypatch.setattr(db, "get_paper_attributes", raise_error)
+    monkeypatch.setattr(db, "get_all_paper_attributes", raise_error)
+    index = widget.papersList.sortChooser.findText("Sort by First Author")
+    widget.papersList.sortChooser.setCurrentIndex(index)
+    bibcodes = [paper.bibcode for paper in widget.papersList.getPapers()]
+    assert bibcodes == [u.mine.bibcode, u.tremonti.bibcode]
+
+
+def test_paper_sort_keys_read_from_database_at_once(qtbot, db, monkeypatch):
+    # sorting should not get the keys of each paper separately
+    def raise_error(*args, **kwargs):
+        raise AssertionError("should not get each paper separately")
+
+    monkeypatch.setattr(db, "get_paper_attribute", raise_error)
+    monkeypatch.setattr(db, "get_paper_attributes", raise_error)
+    widget = cInitialize(qtbot, db)
+    index = widget.papersList.sortChooser.findText("Sort by First Author")
+    widget.papersList.sortChooser.setCurrentIndex(index)
+    bibcodes = [paper.bibcode for paper in widget.papersList.getPapers()]
+    assert bibcodes == [u.mine.bibcode, u.tremonti.bibcode]
+
+
 def test_paper_sort_dropdown_can_sort_by_author_same_last_name(qtbot, db_temp):
     # add another paper by Warren Brown, should be sorted after me (Gillen Brown)
     db_temp.add_paper("2015ApJ...804...49B")
@@ -5078,6 +5422,53 @@ def test_clicking_on_show_all_button_shows_all_papers(qtbot, db):
         assert paper.isHidden() is False
 
 
+def test_clicking_on_same_tag_again_does_not_go_through_papers(qtbot, db, monkeypatch):
+    widget = cInitialize(qtbot, db)
+    left_tag = widget.tagsList.tags[0]
+    cClick(left_tag, qtbot)
+
+    # the papers shown are already correct, so they don't need to be checked
+    def raise_error(*args, **kwargs):
+        raise AssertionError("should not go through papers")
+
+    monkeypatch.setattr(widget.papersList, "getPapers", raise_error)
+    cClick(left_tag, qtbot)
+
+
+def test_forced_show_papers_goes_through_papers_for_same_tag(qtbot, db, monkeypatch):
+    widget = cInitialize(qtbot, db)
+    left_tag = widget.tagsList.tags[0]
+    cClick(left_tag, qtbot)
+    # refreshing the papers shown should check them all, even for the same tag
+    calls = []
+    monkeypatch.setattr(widget.papersList, "getPapers", lambda: calls.append(1) or [])
+    left_tag.showPapers(force=True)
+    assert calls == [1]
+
+
+def test_clicking_on_same_tag_again_updates_if_tags_changed(qtbot, db_temp):
+    db_temp.add_new_tag("test")
+    db_temp.tag_paper(u.mine.bibcode, "test")
+    widget = cInitialize(qtbot, db_temp)
+    left_tag = [t for t in widget.tagsList.tags if t.name == "test"][0]
+    cClick(left_tag, qtbot)
+    # then add another paper to this tag outside of the interface, and click again
+    db_temp.tag_paper(u.tremonti.bibcode, "test")
+    cClick(left_tag, qtbot)
+    for paper in widget.papersList.getPapers():
+        assert paper.isHidden() is False
+
+
+def test_clicking_on_tags_leaves_papers_list_updating(qtbot, db):
+    widget = cInitialize(qtbot, db)
+    # repainting is paused while papers are shown or hidden, make sure it's turned
+    # back on afterwards
+    cClick(widget.tagsList.tags[0], qtbot)
+    assert widget.papersList.updatesEnabled() is True
+    cClick(widget.tagsList.showAllButton, qtbot)
+    assert widget.papersList.updatesEnabled() is True
+
+
 def test_show_all_tags_button_starts_highlighted(qtbot, db_temp):
     widget = cInitialize(qtbot, db_temp)
     assert widget.tagsList.showAllButton.property("is_highlighted") is True
@@ -5151,6 +5542,22 @@ def test_left_panel_tags_are_sorted_alphabetically_after_adding(qtbot, db_empty)
     assert tag_names == sorted(tags + ["Unread"], key=lambda w: w.lower())
 
 
+def test_left_panel_tags_layout_is_sorted_alphabetically_after_adding(qtbot, db_empty):
+    widget = cInitialize(qtbot, db_empty)
+    # add tags
+    tags = ["abc", "zyx", "Aye", "Test", "ZAA"]
+    for tag in tags:
+        cAddTag(widget, tag, qtbot)
+    # the tags are the last things in the layout, check that they're in order there
+    layout = widget.tagsList.layout()
+    n_tags = len(widget.tagsList.tags)
+    layout_tags = [
+        layout.itemAt(idx).widget().name
+        for idx in range(layout.count() - n_tags, layout.count())
+    ]
+    assert layout_tags == sorted(tags + ["Unread"], key=lambda w: w.lower())
+
+
 # =============
 # renaming tags
 # =============